@@ -0,0 +1,39 @@
+"""token hash and expiry
+
+Revision ID: 3f9a1c2b7d4e
+Revises: d60e4487cfaa
+Create Date: 2026-10-19 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3f9a1c2b7d4e"
+down_revision = "d60e4487cfaa"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("tokens", sa.Column("token_hash", sa.String(length=64), nullable=True))
+    op.add_column("tokens", sa.Column("expires_at", sa.DateTime(), nullable=True))
+    # keep sessions that are still alive: hash stored JWTs, expiry is estimated from created_at
+    op.execute(
+        "UPDATE tokens SET "
+        "token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex'), "
+        "expires_at = created_at + interval '1 day'"
+    )
+    op.execute("DELETE FROM tokens WHERE token_hash IS NULL")
+    op.create_index(op.f("ix_tokens_token_hash"), "tokens", ["token_hash"], unique=False)
+    op.create_index(op.f("ix_tokens_expires_at"), "tokens", ["expires_at"], unique=False)
+    op.drop_column("tokens", "token")
+
+
+def downgrade() -> None:
+    op.add_column("tokens", sa.Column("token", sa.Text(), nullable=True))
+    op.drop_index(op.f("ix_tokens_expires_at"), table_name="tokens")
+    op.drop_index(op.f("ix_tokens_token_hash"), table_name="tokens")
+    op.drop_column("tokens", "expires_at")
+    op.drop_column("tokens", "token_hash")
@@ -0,0 +1,25 @@
+"""disk updated_at
+
+Revision ID: c41d7e9a2f60
+Revises: 8b2e5d41c0f7
+Create Date: 2026-10-19 14:12:31.402917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c41d7e9a2f60"
+down_revision = "8b2e5d41c0f7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("disks", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    op.execute("UPDATE disks SET updated_at = COALESCE(created_at, now())")
+
+
+def downgrade() -> None:
+    op.drop_column("disks", "updated_at")
@@ -0,0 +1,83 @@
+"""disk change log
+
+Revision ID: e7a3b9d15c28
+Revises: c41d7e9a2f60
+Create Date: 2026-10-19 16:05:47.219336
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "e7a3b9d15c28"
+down_revision = "c41d7e9a2f60"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "inventory_state",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.BIGINT(), nullable=False),
+        sa.Column("changed_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute(
+        "INSERT INTO inventory_state (id, version, changed_at) "
+        "VALUES (1, 0, now() at time zone 'utc')"
+    )
+    op.create_table(
+        "disk_changes",
+        sa.Column("version", sa.BIGINT(), autoincrement=False, nullable=False),
+        sa.Column("disk_id", sa.Integer(), nullable=False),
+        sa.Column("op", sa.String(length=6), nullable=False),
+        sa.Column("data", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("version"),
+    )
+    # existing disks become first versions, so syncing from 0 sees them
+    op.execute(
+        "INSERT INTO disk_changes (version, disk_id, op, data, created_at) "
+        "SELECT row_number() OVER (ORDER BY id), id, 'insert', to_jsonb(disks), "
+        "now() at time zone 'utc' FROM disks"
+    )
+    op.execute(
+        "UPDATE inventory_state SET version = (SELECT count(*) FROM disk_changes)"
+    )
+    # the state row lock serializes writers, so versions become visible in order
+    op.execute(
+        """
+        CREATE FUNCTION record_disk_change() RETURNS trigger AS $$
+        DECLARE
+            new_version bigint;
+        BEGIN
+            UPDATE inventory_state
+            SET version = version + 1, changed_at = now() at time zone 'utc'
+            WHERE id = 1
+            RETURNING version INTO new_version;
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO disk_changes (version, disk_id, op, data, created_at)
+                VALUES (new_version, OLD.id, 'delete', NULL, now() at time zone 'utc');
+                RETURN OLD;
+            END IF;
+            INSERT INTO disk_changes (version, disk_id, op, data, created_at)
+            VALUES (new_version, NEW.id, lower(TG_OP), to_jsonb(NEW), now() at time zone 'utc');
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER disks_record_change AFTER INSERT OR UPDATE OR DELETE ON disks "
+        "FOR EACH ROW EXECUTE FUNCTION record_disk_change()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER disks_record_change ON disks")
+    op.execute("DROP FUNCTION record_disk_change()")
+    op.drop_table("disk_changes")
+    op.drop_table("inventory_state")
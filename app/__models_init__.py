@@ -1,3 +1,4 @@
 from app.src.base import Base  # noqa
 from app.src.auth import auth_models  # noqa
 from app.src.disk_manager import disk_manager_models  # noqa
+from app.src.rate_limit import rate_limit_models  # noqa
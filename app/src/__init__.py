@@ -6,6 +6,7 @@ from app.src.auth import (
     auth_models,
     auth_schemas,
     auth_constants,
+    auth_tasks,
 )
 from app.src.disk_manager import (
     disk_manager_router,
@@ -14,4 +15,12 @@ from app.src.disk_manager import (
     disk_manager_models,
     disk_manager_schemas,
     disk_manager_init_db,
+    disk_manager_events,
+    disk_manager_tasks,
+)
+from app.src.diagnostics import diagnostics_router
+from app.src.rate_limit import (
+    rate_limit_models,
+    rate_limit_schemas,
+    rate_limit_service,
 )
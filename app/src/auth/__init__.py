@@ -4,3 +4,4 @@ import app.src.auth.schemas as auth_schemas
 import app.src.auth.service as auth_service
 import app.src.auth.routes as auth_router
 import app.src.auth.constants as auth_constants
+import app.src.auth.tasks as auth_tasks
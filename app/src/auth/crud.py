@@ -7,6 +7,7 @@ from logger import logger
 from app.src.auth.models import User, Token
 from app.src.auth.schemas import UserCreate, UserUpdate, TokenCreate, TokenUpdate
 from app.src.base import CRUDBase
+from app.src.base.utils import hash_token
 
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
@@ -17,13 +18,13 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         :param username: str
         :return: model.User
         """
-        logger.log(f"{datetime.now()} - get user by username: {username}")
+        logger.debug("get user by username: {username}", username=username)
         db_user = (
             await session.execute(
                 select(self.model).where(self.model.username == username)
             )
         ).scalar_one_or_none()
-        logger.log(f"{datetime.now()} - User: {db_user}")
+        logger.debug("User: {user}", user=db_user)
         return db_user
 
 
@@ -38,12 +39,14 @@ class CRUDToken(CRUDBase[Token, TokenCreate, TokenUpdate]):
         :param access_token: str
         :return: models.Token
         """
-        logger.log(f"{datetime.now()} - get token by access token: {access_token}")
+        logger.debug("get token by access token: {token}", token=access_token)
         return (
             await session.execute(
-                select(self.model).where(self.model.token == access_token)
+                select(self.model).where(
+                    self.model.token_hash == hash_token(access_token)
+                )
             )
-        ).scalar_one_or_none()
+        ).scalars().first()
 
     async def revoke(self, session: AsyncSession, token: str) -> None:
         """
@@ -52,11 +55,36 @@ class CRUDToken(CRUDBase[Token, TokenCreate, TokenUpdate]):
         :param token: str
         :return: None
         """
-        logger.log(f"{datetime.now()} - revoke token: {token}")
-        query = delete(self.model).where(self.model.token == token)
+        logger.debug("revoke token: {token}", token=token)
+        query = delete(self.model).where(self.model.token_hash == hash_token(token))
         await session.execute(query)
-        await session.commit()
+        await self._commit(session)
         return
 
+    async def remove_expired(
+        self, session: AsyncSession, batch_size: int, now: datetime = None
+    ) -> int:
+        """
+        delete one bounded batch of expired tokens
+        :param session: AsyncSession
+        :param batch_size: int - max rows deleted by one statement
+        :param now: datetime (utc), defaults to datetime.utcnow()
+        :return: int - count of deleted rows
+        """
+        now = now or datetime.utcnow()
+        expired_ids = (
+            select(self.model.id)
+            .where(self.model.expires_at < now)
+            .limit(batch_size)
+        )
+        result = await session.execute(
+            delete(self.model)
+            .where(self.model.id.in_(expired_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await self._commit(session)
+        logger.debug("removed expired tokens: {count}", count=result.rowcount)
+        return result.rowcount
+
 
 crud_token = CRUDToken(Token)
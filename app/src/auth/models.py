@@ -1,7 +1,7 @@
 from datetime import datetime
 
 from app.src.base import Base
-from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, func
 from sqlalchemy.orm import relationship, backref
 
 
@@ -24,5 +24,6 @@ class Token(Base):
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    token = Column(Text)
+    token_hash = Column(String(64), index=True)  # sha256 of JWT
+    expires_at = Column(DateTime, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
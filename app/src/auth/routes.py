@@ -1,22 +1,21 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from fastapi import APIRouter, Cookie, Depends, HTTPException, status, Form
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.requests import Request
 from starlette.responses import RedirectResponse
 
 from logger import logger
 from app.src.auth import schemas, service, models, crud
-from app.src.auth.crud import crud_token
-from app.src.auth.models import Token
 from app.src.base import get_session, settings
 from app.src.base.exceptions import WeakPassword
+from app.src.base.db.unit_of_work import UnitOfWorkRoute
+from app.src.base.templating import templates
+from app.src.rate_limit.service import login_rate_limits
 
-router = APIRouter(prefix="/auth", tags=["auth"])
-templates = Jinja2Templates(directory="templates")
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=UnitOfWorkRoute)
 
 
 async def get_context(request: Request, session: AsyncSession = Depends(get_session)) -> dict:
@@ -26,19 +25,16 @@ async def get_context(request: Request, session: AsyncSession = Depends(get_sess
     :param session: AsyncSession
     :return: dict
     """
-    logger.log(f"{datetime.now()} - (auth.routes) Get context for {request.url.path}")
-    access_token = await service.auth_service.get_access_token_from_cookie(
-        request.cookies.get("access_token")
-    )
-    if access_token:
-        username = await service.auth_service.get_username_from_token(
-            session=session, access_token=access_token
-        )
-    else:
-        username = None
-
-    logger.log(
-        f"{datetime.now()} - (auth.routes) Context: {request.url.path} - {access_token} - {username}"
+    logger.debug("(auth.routes) Get context for {path}", path=request.url.path)
+    identity = await service.auth_service.get_identity(request, session)
+    access_token = identity.access_token if identity else None
+    username = identity.username if identity else None
+
+    logger.debug(
+        "(auth.routes) Context: {path} - {access_token} - {username}",
+        path=request.url.path,
+        access_token=access_token,
+        username=username,
     )
 
     return {"request": request, "access_token": access_token, "username": username}
@@ -46,7 +42,7 @@ async def get_context(request: Request, session: AsyncSession = Depends(get_sess
 
 @router.get("/register")
 async def register(request: Request, context: dict = Depends(get_context)):
-    logger.log(f"{datetime.now()} - (auth.routes) Get register page")
+    logger.debug("(auth.routes) Get register page")
     return templates.TemplateResponse("register.html", context)
 
 
@@ -59,7 +55,7 @@ async def register(
     password: str = Form(...),
     session: AsyncSession = Depends(get_session),
 ):
-    logger.log(f"{datetime.now()} - (auth.routes) Register post")
+    logger.debug("(auth.routes) Register post")
     try:
         user = schemas.UserCreate(
             full_name=full_name, email=email, username=username, password=password
@@ -69,7 +65,7 @@ async def register(
             "register.html", {"request": request, "error": "Weak password"}
         )
 
-    password_hash = service.auth_service.get_password_hash(user.password)
+    password_hash = await service.auth_service.get_password_hash(user.password)
     user_dict = user.dict()
     user_dict["password"] = password_hash
     new_user = models.User(**user_dict)
@@ -90,11 +86,15 @@ async def register(
 
     # Save access token in database
     await service.auth_service.create_token(
-        session=session, username=new_user.username, access_token=access_token
+        session=session, user_id=new_user.id, access_token=access_token
     )
 
-    logger.log(
-        f"{datetime.now()} - (auth.routes) Register post - {new_user.__dict__} - {access_token}"
+    logger.info("(auth.routes) Registered user {username}", username=new_user.username)
+    logger.debug(
+        "(auth.routes) Register post - user {user_id} {username} - {access_token}",
+        user_id=new_user.id,
+        username=new_user.username,
+        access_token=access_token,
     )
 
     return response
@@ -102,13 +102,13 @@ async def register(
 
 @router.get("/login", response_class=HTMLResponse)
 async def login(request: Request, context: dict = Depends(get_context), next: str = ""):
-    logger.log(f"{datetime.now()} - (auth.routes) Get login page")
+    logger.debug("(auth.routes) Get login page")
     context["next"] = next
-    logger.log(f"{datetime.now()} - (auth.routes) Get login page - {context}")
+    logger.debug("(auth.routes) Get login page - {context}", context=context)
     return templates.TemplateResponse("login.html", context)
 
 
-@router.post("/login")
+@router.post("/login", dependencies=login_rate_limits)
 async def login_post(
     request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
@@ -116,7 +116,7 @@ async def login_post(
     context: dict = Depends(get_context),
     next: str = None,
 ):
-    logger.log(f"{datetime.now()} - (auth.routes) Login post")
+    logger.debug("(auth.routes) Login post")
     user = await service.auth_service.authenticate_user(
         username=form_data.username, password=form_data.password, session=session
     )
@@ -127,8 +127,9 @@ async def login_post(
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token = service.auth_service.create_access_token(data={"sub": user.username})
-    token = Token(token=access_token, user_id=user.id)
-    await crud_token.create(session, obj_in=token)
+    await service.auth_service.create_token(
+        session=session, user_id=user.id, access_token=access_token
+    )
 
     response = RedirectResponse(url="/auth/set_token")
     response.set_cookie(
@@ -142,8 +143,11 @@ async def login_post(
     context["current_user"] = user
     context["access_token"] = access_token
     context["next"] = next
-    logger.log(
-        f"{datetime.now()} - (auth.routes) Login post - {user.__dict__} - {access_token}"
+    logger.debug(
+        "(auth.routes) Login post - user {user_id} {username} - {access_token}",
+        user_id=user.id,
+        username=user.username,
+        access_token=access_token,
     )
     return response
 
@@ -154,30 +158,30 @@ async def logout(
     access_token: str = Cookie(None),
     session: AsyncSession = Depends(get_session),
 ):
-    logger.log(f"{datetime.now()} - (auth.routes) Logout")
+    logger.debug("(auth.routes) Logout")
     if access_token:
-        await crud_token.revoke(session, access_token)
+        await service.auth_service.revoke_token(session, access_token)
 
     response = RedirectResponse(url="/auth/login")
     response.delete_cookie(key="access_token")
-    logger.log(f"{datetime.now()} - (auth.routes) Logout - {access_token}")
+    logger.debug("(auth.routes) Logout - {access_token}", access_token=access_token)
     return response
 
 
 @router.post("/set_token", response_class=HTMLResponse)
 async def set_token_view(request: Request, context: dict = Depends(get_context)):
-    logger.log(f"{datetime.now()} - (auth.routes) Set token")
+    logger.debug("(auth.routes) Set token")
     return templates.TemplateResponse("set_token.html", context)
 
 
-@router.post("/token")
+@router.post("/token", dependencies=login_rate_limits)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     session: AsyncSession = Depends(get_session),
 ):
-    logger.log(f"{datetime.now()} - (auth.routes) Login for access token")
+    logger.debug("(auth.routes) Login for access token")
     user = await service.auth_service.authenticate_user(
-        session, form_data.username, form_data.password
+        username=form_data.username, password=form_data.password, session=session
     )
     if not user:
         raise HTTPException(
@@ -187,11 +191,15 @@ async def login_for_access_token(
         )
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = service.auth_service.create_access_token(
-        user.id, expires_delta=access_token_expires
+        data={"sub": user.username}, expires_delta=access_token_expires
+    )
+    await service.auth_service.create_token(
+        session=session, user_id=user.id, access_token=access_token
     )
-    token = Token(token=access_token, user_id=user.id)
-    await crud_token.create(session, obj_in=token)
-    logger.log(
-        f"{datetime.now()} - (auth.routes) Login for access token - {user.__dict__} - {access_token}"
+    logger.debug(
+        "(auth.routes) Login for access token - user {user_id} {username} - {access_token}",
+        user_id=user.id,
+        username=user.username,
+        access_token=access_token,
     )
     return access_token
@@ -57,3 +57,15 @@ class TokenUpdate(TokenBase):
 class TokenData(BaseModel):
     username: Optional[str] = None
     access_token: Optional[str] = None
+
+
+class TokenIdentity(BaseModel):
+    """
+    verified access_token claims together with identity of its owner
+    """
+
+    user_id: int
+    username: str
+    access_token: str
+    claims: dict
+    expires_at: datetime
@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import HTTPException, Depends, Cookie
+from fastapi import HTTPException, Depends, Cookie, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -10,51 +10,102 @@ from logger import logger
 from app.src.base import settings
 from app.src.auth.crud import crud_user, crud_token
 from app.src.auth.models import User, Token
-from app.src.auth.schemas import TokenData
+from app.src.auth.schemas import TokenIdentity
 from app.src.base.db import get_session
+from app.src.base.db.session import release_connection
 from app.src.base import exceptions
+from app.src.base.cache import LRUCache
+from app.src.base.tracing import traced
+from app.src.base.utils import hash_token
+from app.src.base.workers import BoundedWorkerPool
 
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt burns 100+ ms of CPU per call, keep it off the event loop
+password_pool = BoundedWorkerPool(
+    "password-hash",
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
+# token hash -> schemas.TokenIdentity, per worker process
+identity_cache = LRUCache(max_size=settings.TOKEN_CACHE_SIZE)
+
+admin_usernames = {
+    name.strip() for name in settings.ADMIN_USERNAMES.split(",") if name.strip()
+}
+
+# marker for request.state, None is valid resolved identity of anonymous request
+_UNRESOLVED = object()
+
 
 class AuthService:
     @staticmethod
-    async def get_current_user(
-            session: AsyncSession = Depends(get_session),
-            token: str = Depends(oauth2_scheme),
-    ) -> str:
+    @traced("auth.resolve_token")
+    async def resolve_token(
+            session: AsyncSession, access_token: str
+    ) -> Optional[TokenIdentity]:
         """
-        Return user by access_token
+        Verify access_token and return its claims with owner identity.
+        Result is cached until token `exp`, so repeated calls cost no decode and no DB query
         :param session: AsyncSession
-        :param token: str (get from Depends)
-        :return: str (token)
+        :param access_token: str
+        :return: schemas.TokenIdentity or None if token is invalid, revoked or user is gone
         """
-        logger.log(f"{datetime.now()} - get current user")
+        token_hash = hash_token(access_token)
+        identity: Optional[TokenIdentity] = identity_cache.get(token_hash)
+        if identity is not None:
+            return identity
+
+        logger.debug("resolve token")
         try:
             payload = jwt.decode(
-                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+                access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
             )
-            username: str = payload.get("sub")
-            if username is None:
-                raise HTTPException(
-                    status_code=401, detail="Invalid authentication token"
-                )
-            token_data = TokenData(username=username, access_token=token)
-        except JWTError as e:
-            raise HTTPException(
-                status_code=401, detail="Invalid authentication token"
-            ) from e
+        except JWTError:
+            return None
+        username: str = payload.get("sub")
+        if username is None:
+            return None
 
+        if await crud_token.get_by_access_token(session, access_token) is None:
+            return None  # revoked
         user: User = await crud_user.get_user_by_username(
-            session=session, username=token_data.username
+            session=session, username=username
         )
         if user is None:
-            raise HTTPException(status_code=401, detail="Invalid username or password")
-        logger.log(f"{datetime.now()} - get current user - {user}")
+            return None
+
+        identity = TokenIdentity(
+            user_id=user.id,
+            username=user.username,
+            access_token=access_token,
+            claims=payload,
+            expires_at=datetime.utcfromtimestamp(payload["exp"]),
+        )
+        identity_cache.set(token_hash, identity, expires_at=payload["exp"])
+        logger.debug("resolve token - {username}", username=user.username)
+        return identity
+
+    @staticmethod
+    async def get_current_user(
+            session: AsyncSession = Depends(get_session),
+            token: str = Depends(oauth2_scheme),
+    ) -> str:
+        """
+        Return user by access_token
+        :param session: AsyncSession
+        :param token: str (get from Depends)
+        :return: str (token)
+        """
+        logger.debug("get current user")
+        identity = await auth_service.resolve_token(session, token)
+        if identity is None:
+            raise HTTPException(status_code=401, detail="Invalid authentication token")
+        logger.debug("get current user - {username}", username=identity.username)
         return token
 
     @staticmethod
@@ -67,7 +118,7 @@ class AuthService:
         :param expires_delta: datetime.timedelta
         :return: str
         """
-        logger.log(f"{datetime.now()} - create access token")
+        logger.debug("create access token")
         to_encode = data.copy()
         if expires_delta:
             expire = datetime.utcnow() + expires_delta
@@ -79,20 +130,25 @@ class AuthService:
         encoded_jwt = jwt.encode(
             to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
         )
-        logger.log(f"{datetime.now()} - create access token - {encoded_jwt}")
+        logger.debug("create access token - {token}", token=encoded_jwt)
         return encoded_jwt
 
     @staticmethod
-    def verify_password(plain_password: str, hashed_password: str) -> bool:
-        logger.log(f"{datetime.now()} - verify password")
-        return pwd_context.verify(plain_password, hashed_password)
+    @traced("auth.verify_password")
+    async def verify_password(plain_password: str, hashed_password: str) -> bool:
+        logger.debug("verify password")
+        return await password_pool.run(
+            pwd_context.verify, plain_password, hashed_password
+        )
 
     @staticmethod
-    def get_password_hash(password: str) -> str:
-        logger.log(f"{datetime.now()} - get password hash")
-        return pwd_context.hash(password)
+    @traced("auth.get_password_hash")
+    async def get_password_hash(password: str) -> str:
+        logger.debug("get password hash")
+        return await password_pool.run(pwd_context.hash, password)
 
     @staticmethod
+    @traced("auth.authenticate_user")
     async def authenticate_user(
             username: str, password: str, session: AsyncSession
     ) -> Optional[User]:
@@ -103,13 +159,13 @@ class AuthService:
         :param session: AsyncSession
         :return: models.User
         """
-        logger.log(f"{datetime.now()} - authenticate user")
+        logger.debug("authenticate user")
         user = await crud_user.get_user_by_username(session=session, username=username)
         if not user:
             return None
-        if not auth_service.verify_password(password, user.password):
+        if not await auth_service.verify_password(password, user.password):
             return None
-        logger.log(f"{datetime.now()} - authenticate user - {user}")
+        logger.info("authenticate user - {username}", username=user.username)
         return user
 
     @staticmethod
@@ -121,43 +177,115 @@ class AuthService:
         :param access_token: Cookie
         :return: str
         """
-        logger.log(f"{datetime.now()} - get access token from cookie")
+        logger.debug("get access token from cookie")
         if not access_token:
             return None
-        logger.log(f"{datetime.now()} - get access token from cookie - {access_token}")
+        logger.debug("get access token from cookie - {token}", token=access_token)
         return access_token
 
     @staticmethod
-    async def is_user_authed(access_token: Optional[str] = Cookie(None)):
+    @traced("auth.get_identity")
+    async def get_identity(
+            request: Request, session: AsyncSession = Depends(get_session)
+    ) -> Optional[TokenIdentity]:
+        """
+        Resolve identity from request cookie at most once per request,
+        result is kept in request.state and shared by all auth dependencies
+        :param request: fastapi.Request
+        :param session: AsyncSession
+        :return: schemas.TokenIdentity or None for anonymous request
+        """
+        identity = getattr(request.state, "identity", _UNRESOLVED)
+        if identity is not _UNRESOLVED:
+            return identity
+
+        access_token = request.cookies.get("access_token")
+        identity = None
+        if access_token:
+            identity = await auth_service.resolve_token(session, access_token)
+            # don't hold pooled connection for the rest of request (streaming etc.)
+            await release_connection(session)
+        request.state.identity = identity
+        logger.debug("get identity - {identity}", identity=identity)
+        return identity
+
+    @staticmethod
+    async def is_user_authed(
+            request: Request, session: AsyncSession = Depends(get_session)
+    ) -> str:
         """
         Check is user authed
-        :param access_token: Cookie
-        :return: str
+        :param request: fastapi.Request
+        :param session: AsyncSession
+        :return: str (access_token)
         :raise: Unauthorized
         """
-        logger.log(f"{datetime.now()} - is user authed")
-        if not access_token:
-            raise exceptions.Unauthorized("No token in cookies")
-        logger.log(f"{datetime.now()} - is user authed - {access_token}")
-        return access_token
+        logger.debug("is user authed")
+        identity = await auth_service.get_identity(request, session)
+        if identity is None:
+            raise exceptions.Unauthorized("No valid token in cookies")
+        logger.debug("is user authed - {username}", username=identity.username)
+        return identity.access_token
 
     @staticmethod
-    async def create_token(session: AsyncSession, username: str, access_token: str):
+    async def is_admin(
+            request: Request, session: AsyncSession = Depends(get_session)
+    ) -> str:
         """
-        create token and fill it into db
+        Check user is authed and listed in ADMIN_USERNAMES
+        :param request: fastapi.Request
         :param session: AsyncSession
-        :param username: str
+        :return: str (access_token)
+        :raise: Unauthorized, Forbidden
+        """
+        identity = await auth_service.get_identity(request, session)
+        if identity is None:
+            raise exceptions.Unauthorized("No valid token in cookies")
+        if identity.username not in admin_usernames:
+            raise exceptions.Forbidden(f"User {identity.username} is not admin")
+        return identity.access_token
+
+    @staticmethod
+    @traced("auth.create_token")
+    async def create_token(session: AsyncSession, user_id: int, access_token: str):
+        """
+        create token and fill it into db, only hash and expiry of access_token are stored
+        :param session: AsyncSession
+        :param user_id: int
         :param access_token: str
         :return: models.Token
         """
-        logger.log(f"{datetime.now()} - create token")
-        db_user: User = await crud_user.get_user_by_username(
-            session=session, username=username
+        logger.debug("create token")
+        claims = jwt.get_unverified_claims(access_token)
+        token = Token(
+            user_id=user_id,
+            token_hash=hash_token(access_token),
+            expires_at=datetime.utcfromtimestamp(claims["exp"]),
         )
-        token = Token(user_id=db_user.id, token=access_token)
-        logger.log(f"{datetime.now()} - create token - {token}")
+        logger.debug("create token - {token}", token=token)
         return await crud_token.create(db=session, obj_in=token)
 
+    @staticmethod
+    async def purge_expired_tokens(session: AsyncSession) -> int:
+        """
+        delete expired tokens batch by batch, so no single statement locks the whole table
+        :param session: AsyncSession
+        :return: int - total count of deleted tokens
+        """
+        logger.debug("purge expired tokens")
+        batch_size = settings.TOKEN_PURGE_BATCH_SIZE
+        now = datetime.utcnow()
+        total = 0
+        while True:
+            deleted = await crud_token.remove_expired(
+                session, batch_size=batch_size, now=now
+            )
+            total += deleted
+            if deleted < batch_size:
+                break
+        logger.info("purge expired tokens - {total}", total=total)
+        return total
+
     @staticmethod
     async def get_username_from_token(
             session: AsyncSession, access_token: str
@@ -168,42 +296,40 @@ class AuthService:
         :param access_token: str
         :return: str
         """
-        logger.log(f"{datetime.now()} - get username from token")
-        try:
-            payload = jwt.decode(
-                access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-            )
-            username: str = payload.get("sub")
-            if username is None:
-                return None
-            token_data = TokenData(username=username, access_token=access_token)
-        except JWTError as e:
+        logger.debug("get username from token")
+        identity = await auth_service.resolve_token(session, access_token)
+        if identity is None:
             return None
 
-        user = await crud_user.get_user_by_username(
-            session=session, username=token_data.username
-        )
-        if user is None:
-            return None
+        logger.debug("get username from token - {username}", username=identity.username)
+        return identity.username
 
-        logger.log(f"{datetime.now()} - get username from token - {user.username}")
-        return user.username
+    @staticmethod
+    @traced("auth.revoke_token")
+    async def revoke_token(session: AsyncSession, access_token: str) -> None:
+        """
+        delete token from DB and drop it from identity cache
+        :param session: AsyncSession
+        :param access_token: str
+        :return: None
+        """
+        logger.debug("revoke token")
+        await crud_token.revoke(session, access_token)
+        identity_cache.pop(hash_token(access_token))
 
     @staticmethod
     async def get_username_from_cookie(
-            session: AsyncSession, access_token: Optional[str] = Cookie(None)
+            request: Request, session: AsyncSession = Depends(get_session)
     ) -> Optional[str]:
         """
         Parse Cookie and return username
+        :param request: fastapi.Request
         :param session: AsyncSession
-        :param access_token: str
         :return: str
         """
-        logger.log(f"{datetime.now()} - get username from cookie")
-        if not access_token:
-            return None
-        logger.log(f"{datetime.now()} - get username from cookie - {access_token}")
-        return await auth_service.get_username_from_token(session, access_token)
+        logger.debug("get username from cookie")
+        identity = await auth_service.get_identity(request, session)
+        return identity.username if identity else None
 
 
 auth_service = AuthService()
@@ -0,0 +1,35 @@
+import asyncio
+
+from logger import logger
+from app.src.base import settings
+from app.src.base.db.session import get_session_
+from app.src.auth.service import auth_service
+
+
+async def purge_expired_tokens() -> int:
+    """
+    open own session and delete all expired tokens from DB
+    :return: int - count of deleted tokens
+    """
+    session = await get_session_()
+    try:
+        return await auth_service.purge_expired_tokens(session)
+    finally:
+        await session.close()
+
+
+async def token_purge_loop() -> None:
+    """
+    background job, purge expired tokens every TOKEN_PURGE_INTERVAL_SECONDS
+    so tokens table size stays proportional to active sessions
+    :return: None (runs until cancelled)
+    """
+    logger.info("token purge job started")
+    while True:
+        try:
+            await purge_expired_tokens()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("token purge job failed: {error}", error=e)
+        await asyncio.sleep(settings.TOKEN_PURGE_INTERVAL_SECONDS)
@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Bounded in-process LRU cache, every entry can have its own expiry time
+    """
+
+    def __init__(self, max_size: int, clock: Callable[[], float] = time.time):
+        """
+        :param max_size: int - max count of entries, least recently used is evicted first
+        :param clock: callable returning current unix time, used for expiry checks
+        """
+        self.max_size = max_size
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        return cached value or default if it is missing or expired
+        :param key: Hashable
+        :param default: Any
+        :return: Any
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        """
+        put value into cache
+        :param key: Hashable
+        :param value: Any
+        :param expires_at: unix time after which entry is treated as missing, None - never
+        :return: None
+        """
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        remove entry and return its value
+        :param key: Hashable
+        :param default: Any
+        :return: Any
+        """
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
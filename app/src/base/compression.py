@@ -0,0 +1,200 @@
+import gzip
+import hashlib
+import zlib
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+from app.src.base.cache import LRUCache
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with brotli or gzip (whatever client accepts, brotli first).
+    Only allowlisted content types not smaller than minimum_size are compressed,
+    already encoded responses are passed as is.
+    Whole bodies are compressed once per content: result is cached by body hash,
+    so identical payloads (same disks list for every client) cost one hash.
+    Streamed bodies are compressed chunk by chunk
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        content_types: Iterable[str] = (
+            "text/html",
+            "text/css",
+            "text/plain",
+            "application/javascript",
+            "application/json",
+        ),
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        cache_size: int = 256,
+        cache_max_body: int = 1024 * 1024,
+    ):
+        """
+        :param app: ASGI app
+        :param minimum_size: int - bytes, smaller bodies are sent uncompressed
+        :param content_types: media types allowed to be compressed
+        :param gzip_level: int 1-9
+        :param brotli_quality: int 0-11
+        :param cache_size: int - count of cached compressed bodies
+        :param cache_max_body: int - bytes, bigger bodies are not cached
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = {value.strip().lower() for value in content_types}
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_max_body = cache_max_body
+        self.cache = LRUCache(max_size=cache_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self.choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    @staticmethod
+    def choose_encoding(accept_encoding: str) -> Optional[str]:
+        accepted = set()
+        for value in accept_encoding.lower().split(","):
+            name, _, params = value.partition(";")
+            quality = params.strip().removeprefix("q=")
+            try:
+                if params and float(quality) == 0:
+                    continue  # explicitly refused
+            except ValueError:
+                pass
+            accepted.add(name.strip())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def is_compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return media_type in self.content_types
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        """
+        compress whole body, results for the same body are taken from cache
+        :param encoding: str - "br" or "gzip"
+        :param body: bytes
+        :return: bytes
+        """
+        cacheable = len(body) <= self.cache_max_body
+        if cacheable:
+            key = (encoding, hashlib.sha1(body).digest())
+            compressed = self.cache.get(key)
+            if compressed is not None:
+                return compressed
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        if cacheable:
+            self.cache.set(key, compressed)
+        return compressed
+
+    def stream_compressor(self, encoding: str):
+        """
+        :param encoding: str - "br" or "gzip"
+        :return: callable (chunk: bytes, last: bool) -> bytes
+        """
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+
+            def compress_chunk(chunk: bytes, last: bool) -> bytes:
+                data = compressor.process(chunk)
+                return data + (compressor.finish() if last else compressor.flush())
+
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+
+            def compress_chunk(chunk: bytes, last: bool) -> bytes:
+                data = compressor.compress(chunk)
+                return data + compressor.flush(
+                    zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+                )
+
+        return compress_chunk
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.active = None  # decided on first body message
+        self.compress_chunk = None
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.active is None:
+            headers = Headers(raw=self.start_message["headers"])
+            self.active = self.middleware.is_compressible(headers) and (
+                more_body or len(body) >= self.middleware.minimum_size
+            )
+            if not self.active:
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+            if more_body:
+                self.compress_chunk = self.middleware.stream_compressor(self.encoding)
+                await self._send(self._encoded_start(content_length=None))
+            else:
+                compressed = self.middleware.compress(self.encoding, body)
+                await self._send(self._encoded_start(content_length=len(compressed)))
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+
+        if not self.active:
+            await self._send(message)
+            return
+        await self._send(
+            {
+                "type": "http.response.body",
+                "body": self.compress_chunk(body, not more_body),
+                "more_body": more_body,
+            }
+        )
+
+    def _encoded_start(self, content_length: Optional[int]) -> Message:
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"  # encoded body is not byte-equal anymore
+        self.start_message["headers"] = headers.raw
+        return self.start_message
@@ -0,0 +1,98 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """
+    build weak ETag from values response body depends on
+    :param parts: any values with stable str()
+    :return: str - W/"<hash>"
+    """
+    digest = hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    """
+    :param value: datetime - naive values are treated as utc
+    :return: str - RFC 7231 date
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: Optional[datetime] = None
+) -> bool:
+    """
+    check request validators, If-None-Match wins over If-Modified-Since as RFC 7232 says
+    :param request: fastapi.Request
+    :param etag: str - current ETag
+    :param last_modified: datetime (utc) or None
+    :return: bool - True if client copy is fresh and 304 can be returned
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        current = etag.removeprefix("W/")
+        return any(
+            tag.strip().removeprefix("W/") == current
+            for tag in if_none_match.split(",")
+        )
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # http dates have no fractions of second
+    return last_modified.replace(microsecond=0) <= since
+
+
+def set_validators(
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    vary: str = "Cookie, Authorization",
+) -> Response:
+    """
+    add ETag, Last-Modified and revalidation headers to response
+    :param response: fastapi.Response
+    :param etag: str
+    :param last_modified: datetime (utc) or None
+    :param vary: str - request headers response body depends on
+    :return: the same response
+    """
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    # pages contain user data, so only browser may store them and must revalidate
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.headers["Vary"] = vary
+    return response
+
+
+def not_modified(
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    vary: str = "Cookie, Authorization",
+) -> Response:
+    """
+    :param etag: str
+    :param last_modified: datetime (utc) or None
+    :param vary: str
+    :return: empty 304 response with the same validators as full response
+    """
+    return set_validators(Response(status_code=304), etag, last_modified, vary)
@@ -16,9 +16,89 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    TOKEN_PURGE_INTERVAL_SECONDS: int = 300
+    TOKEN_PURGE_BATCH_SIZE: int = 1000
+    TOKEN_CACHE_SIZE: int = 1024
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 16
+    ADMIN_USERNAMES: str = ""  # comma separated, allowed to use admin diagnostics
+
+    RATE_LIMIT_BACKEND: str = "memory"  # memory | postgres
+    RATE_LIMIT_LOGIN_PER_IP: int = 20  # requests per minute
+    RATE_LIMIT_LOGIN_PER_USERNAME: int = 5
+    RATE_LIMIT_DISK_MUTATIONS_PER_USER: int = 30
+    RATE_LIMIT_DISK_MUTATIONS_PER_DISK: int = 6
 
     SUDO_PASSWORD: str
 
+    TEMPLATES_AUTO_RELOAD: bool = False  # check template files for changes on every render
+    TEMPLATES_BYTECODE_CACHE_DIR: str = ""  # empty - system temp dir
+    TEMPLATES_FRAGMENT_CACHE_SIZE: int = 10000
+    TEMPLATES_STREAM_CHUNK_SIZE: int = 16384  # chars per streamed response chunk
+    DISKS_STREAM_BATCH_SIZE: int = 500  # rows fetched from db cursor at once
+
+    STATIC_DIR: str = "static"
+    STATIC_BUILD_DIR: str = "static_build"  # fingerprinted and precompressed copies
+
+    COMPRESSION_MINIMUM_SIZE: int = 500  # bytes
+    COMPRESSION_CONTENT_TYPES: str = (
+        "text/html,text/css,text/plain,application/javascript,application/json"
+    )
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_CACHE_SIZE: int = 256  # compressed bodies kept in memory
+
+    DISK_EVENTS_HISTORY_SIZE: int = 256  # events kept for reconnecting clients
+    DISK_EVENTS_QUEUE_SIZE: int = 256  # not sent events per client before reset
+    DISK_EVENTS_HEARTBEAT_SECONDS: float = 15
+    DISK_CHANGES_RETENTION: int = 10000  # versions kept for /disks/changes
+    DISK_CHANGES_TRIM_INTERVAL_SECONDS: int = 300
+    DISK_CHANGES_PAGE_SIZE: int = 1000
+
+    PROFILING_DIR: str = "profiles"
+    PROFILING_HEADER: str = "X-Profile"  # authed users send it to profile a request
+    PROFILING_SAMPLE_RATE: float = 0.0  # share of requests profiled in background
+    PROFILING_SLOW_THRESHOLD_SECONDS: float = 1.0  # faster sampled profiles are dropped
+    PROFILING_MAX_FILES: int = 200
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_SECONDS: float = 0.1
+    LOOP_MONITOR_THRESHOLD_SECONDS: float = 0.25  # longer stalls are logged with stack
+
+    TRACING_EXPORTER: str = "none"  # none | file | otlp
+    TRACING_FILE: str = "traces/spans.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_SERVICE_NAME: str = "disk-manager"
+    TRACING_BATCH_SIZE: int = 512
+    TRACING_FLUSH_INTERVAL: float = 1.0  # seconds
+
+    LOG_DIR: str = "logs"
+    LOG_BATCH_SIZE: int = 256
+    LOG_FLUSH_INTERVAL: float = 0.5  # seconds
+    LOG_MAX_FILE_SIZE_MB: int = 50
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_QUEUE_POLICY: str = "drop"  # drop | block
+    LOG_ECHO: bool = True
+    LOG_LEVEL: str = "INFO"  # DEBUG | INFO | WARNING | ERROR
+    LOG_FORMAT: str = "text"  # text | json
+
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # -1 - never
+    DB_POOL_PRE_PING: str = "idle"  # always | idle | never
+    DB_POOL_PRE_PING_IDLE_SECONDS: float = 30  # idle strategy pings only older ones
+    DB_POOL_WARMUP: int = 10  # connections opened at startup, 0 - off
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements per connection
+    DB_REPLICA_URIS: str = ""  # comma separated, read only CRUD calls go there
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5  # more lagging replicas are skipped
+    DB_REPLICA_CHECK_INTERVAL_SECONDS: float = 5
+    DB_READ_YOUR_WRITES_SECONDS: float = 10  # per process, keyed by client address
+    DB_RETRY_ATTEMPTS: int = 3  # tries of read only CRUD calls on connection errors
+    DB_RETRY_BASE_DELAY_SECONDS: float = 0.05  # doubled every retry, with jitter
+    DB_RETRY_MAX_DELAY_SECONDS: float = 1
+    DB_BREAKER_FAILURE_THRESHOLD: int = 5  # failed calls in a row opening breaker
+    DB_BREAKER_RESET_SECONDS: float = 10  # open breaker fails fast that long
+
     SQLALCHEMY_DATABASE_URI: Optional[PostgresDsn] = None
 
     @validator("SQLALCHEMY_DATABASE_URI", pre=True)
@@ -1,4 +1,18 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Type,
+    TypeVar,
+    Union,
+)
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.engine import Result
@@ -6,6 +20,10 @@ from sqlalchemy import select, insert
 from pydantic import BaseModel
 
 from app.src.base.db import Base
+from app.src.base.db.resilience import db_guard
+from app.src.base.db.routing import on_primary, reading
+from app.src.base.metrics import crud_duration
+from app.src.base.tracing import tracer
 
 # Define custom types for SQLAlchemy model, and Pydantic schemas
 ModelType = TypeVar("ModelType", bound=Base)
@@ -13,6 +31,110 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
+# may be served by read replica, see ReplicaRouter
+READ_ONLY_METHODS = frozenset(
+    (
+        "get",
+        "get_all",
+        "get_multi",
+        "get_by_name",
+        "get_user_by_username",
+        "get_inventory_stamp",
+        "get_since",
+        "stream_all",
+    )
+)
+
+
+def _session_arg(args: tuple, kwargs: dict) -> Optional[AsyncSession]:
+    # get(db, id) and get_by_name(session=..., name=...) style calls
+    return args[0] if args else kwargs.get("db", kwargs.get("session"))
+
+
+def _positional_id(args: tuple) -> Optional[int]:
+    # get(db, id) style calls
+    return args[1] if len(args) > 1 and isinstance(args[1], int) else None
+
+
+def _instrument(cls: type) -> None:
+    """
+    wrap public coroutine and async generator methods defined in cls, so their
+    duration is observed
+    in crud_operation_duration_seconds labelled by crud class and method
+    and every call is traced as crud.<class>.<method> span;
+    READ_ONLY_METHODS are allowed to read from replicas and are retried on
+    connection errors, other methods read from primary, read only methods they
+    call included; all calls go through db circuit breaker
+    :param cls: CRUD class
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_"):
+            continue
+        if inspect.isasyncgenfunction(method):
+            setattr(cls, name, _instrument_stream(method))
+            continue
+        if not inspect.iscoroutinefunction(method):
+            continue
+
+        def timed(method=method):
+            read_only = method.__name__ in READ_ONLY_METHODS
+
+            @functools.wraps(method)
+            async def wrapper(self, *args, **kwargs):
+                labels = {"crud": type(self).__name__, "method": method.__name__}
+                span_name = f"crud.{labels['crud']}.{labels['method']}"
+                with crud_duration.time(**labels), tracer.span(
+                    span_name, id=kwargs.get("id", _positional_id(args))
+                ), reading() if read_only else on_primary():
+                    return await db_guard.call(
+                        functools.partial(method, self, *args, **kwargs),
+                        _session_arg(args, kwargs),
+                        idempotent=read_only,
+                    )
+
+            return wrapper
+
+        setattr(cls, name, timed())
+
+
+def _instrument_stream(method):
+    """
+    same for async generator methods (stream_all): routing and guard apply to every
+    step reading rows, not to consumer code running between them, duration is db
+    time of all steps and span covers the whole iteration
+    :param method: async generator function
+    :return: async generator function
+    """
+    read_only = method.__name__ in READ_ONLY_METHODS
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        labels = {"crud": type(self).__name__, "method": method.__name__}
+        started_ns = time.time_ns()
+        spent = 0.0
+        rows = 0
+
+        @contextmanager
+        def step():
+            nonlocal spent
+            started = time.perf_counter()
+            try:
+                with reading() if read_only else on_primary():
+                    yield
+            finally:
+                spent += time.perf_counter() - started
+
+        try:
+            async for item in db_guard.stream(method(self, *args, **kwargs), step):
+                rows += 1
+                yield item
+        finally:
+            crud_duration.observe(spent, **labels)
+            tracer.record(f"crud.{labels['crud']}.{labels['method']}", started_ns, rows=rows)
+
+    return wrapper
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         """Base class that can be extended by other action classes.
@@ -22,6 +144,23 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         self.model = model
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _instrument(cls)
+
+    @staticmethod
+    async def _commit(db: AsyncSession) -> None:
+        """
+        commit, or only flush inside request-scoped unit of work,
+        which commits once when request handler returns
+        :param db: AsyncSession
+        """
+        if db.info.get("unit_of_work"):
+            await db.flush()
+            db.info["pending_writes"] = True
+        else:
+            await db.commit()
+
     async def get_multi(
         self, db: AsyncSession, *, skip: int = 0, limit: int = 100
     ) -> List[ModelType]:
@@ -57,13 +196,17 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         create an object in db
         :param db: AsyncSession
-        :param obj_in: schema.ModelCreate
+        :param obj_in: schema.ModelCreate or Model
         :return: Model
         """
-        obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data)  # type: ignore
+        if isinstance(obj_in, self.model):
+            # already built model, jsonable_encoder would turn datetimes into str
+            db_obj = obj_in
+        else:
+            obj_in_data = jsonable_encoder(obj_in)
+            db_obj = self.model(**obj_in_data)  # type: ignore
         db.add(db_obj)
-        await db.commit()
+        await self._commit(db)
         await db.refresh(db_obj)
         return db_obj
 
@@ -90,7 +233,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         # db.add(db_obj)
-        await db.commit()
+        await self._commit(db)
         await db.refresh(db_obj)
         return db_obj
 
@@ -101,13 +244,11 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         :param id: int
         :return: Model
         """
-        try:
-            obj = (await db.execute(db.query(self.model).get(id))).scalar_one()
-        except Exception as err:
-            print(err)
+        obj = await db.get(self.model, id)
+        if obj is None:
             return None
         await db.delete(obj)
-        await db.commit()
+        await self._commit(db)
         return obj
 
     async def get_all(
@@ -127,3 +268,26 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             )
             return [x[0] for x in res]
         return (await db.execute(select(self.model))).scalars().all()
+
+    async def stream_all(
+        self, db: AsyncSession, batch_size: int = 500
+    ) -> AsyncIterator[ModelType]:
+        """
+        Iterate over all objects through server side cursor, only batch_size rows
+        are held in memory at once
+        :param db: The database session
+        :type db: AsyncSession
+        :param batch_size: count of rows fetched from cursor at once
+        :type batch_size: int
+        :return: async iterator of objects
+        """
+        result = await db.stream_scalars(
+            select(self.model)
+            .order_by(self.model.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for obj in result:
+            yield obj
+
+
+_instrument(CRUDBase)
@@ -0,0 +1,294 @@
+import asyncio
+import math
+import random
+import time
+from contextvars import ContextVar
+from contextlib import nullcontext
+from typing import (
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    ContextManager,
+    Optional,
+    TypeVar,
+)
+
+from sqlalchemy import exc
+
+from app.src.base.core.config import settings
+from app.src.base.exceptions import DatabaseUnavailable
+from app.src.base.metrics import registry
+from logger import logger
+
+T = TypeVar("T")
+
+# CRUD methods calling other CRUD methods (create_or_skip -> get_by_name) are
+# guarded once, by the outer call
+_guarded: ContextVar[bool] = ContextVar("guarded", default=False)
+
+db_retries = registry.counter(
+    "db_retries_total", "Read only CRUD calls retried after connection errors"
+)
+db_rejected = registry.counter(
+    "db_calls_rejected_total", "CRUD calls failed fast by open circuit breaker"
+)
+
+
+def is_transient(err: BaseException) -> bool:
+    """
+    :param err: exception raised by db call
+    :return: bool - db or connection is down, not a bug of statement
+    """
+    if isinstance(err, exc.DBAPIError):
+        return err.connection_invalidated or isinstance(
+            err, (exc.OperationalError, exc.InterfaceError)
+        )
+    return isinstance(
+        err,
+        (exc.TimeoutError, exc.DisconnectionError, OSError, asyncio.TimeoutError),
+    )
+
+
+class CircuitBreaker:
+    """
+    After failure_threshold failed calls in a row breaker opens and calls fail at once
+    for reset_timeout seconds instead of waiting for dead db. Then one probe call
+    is let through (half open): success closes breaker, failure opens it again
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10):
+        """
+        :param failure_threshold: int
+        :param reset_timeout: float - seconds
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started: Optional[float] = None
+
+    def retry_after(self) -> int:
+        left = self.opened_at + self.reset_timeout - time.monotonic()
+        return max(math.ceil(left), 1)
+
+    def before_call(self) -> None:
+        """
+        :raise: DatabaseUnavailable when breaker is open
+        """
+        if self.state == self.CLOSED:
+            return
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                db_rejected.inc()
+                raise DatabaseUnavailable("Database is unavailable", self.retry_after())
+            self.state = self.HALF_OPEN
+        # probe which never finished (cancelled request) doesn't block breaker forever
+        probing = self.probe_started is not None
+        if probing and now - self.probe_started < self.reset_timeout:
+            db_rejected.inc()
+            raise DatabaseUnavailable("Database is unavailable", 1)
+        self.probe_started = now
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Database is available again, circuit breaker is closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probe_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_started = None
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    "Circuit breaker is open after {failures} failed db calls",
+                    failures=self.failures,
+                )
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class DatabaseGuard:
+    """
+    Runs db calls through circuit breaker and retries idempotent ones with
+    jittered exponential backoff, connection errors are turned into
+    DatabaseUnavailable (503) instead of 500
+    """
+
+    def __init__(
+        self,
+        breaker: CircuitBreaker,
+        attempts: int = 3,
+        base_delay: float = 0.05,
+        max_delay: float = 1,
+    ):
+        """
+        :param breaker: CircuitBreaker
+        :param attempts: int - tries of idempotent call
+        :param base_delay: float - seconds, upper bound of first backoff
+        :param max_delay: float - seconds, backoff cap
+        """
+        self.breaker = breaker
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """
+        full jitter: spreads retries of concurrent requests instead of syncing them
+        :param attempt: int - number of failed attempt, from 1
+        :return: float - seconds
+        """
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    @staticmethod
+    def _session_is_fresh(session) -> bool:
+        """
+        rollback before retry expires every loaded object (expire_on_commit
+        doesn't apply to it) and throws away unflushed writes, so only calls
+        made before session loaded or wrote anything are retried
+        """
+        if session is None:
+            return True
+        return not (
+            session.identity_map
+            or session.info.get("wrote")
+            or session.info.get("pending_writes")
+            or session.new
+            or session.dirty
+            or session.deleted
+        )
+
+    async def call(
+        self,
+        func: Callable[[], Awaitable[T]],
+        session=None,
+        idempotent: bool = False,
+    ) -> T:
+        """
+        :param func: coroutine function without arguments making db call
+        :param session: AsyncSession used by func, rolled back before retry
+        :param idempotent: bool - only such calls are retried, and only while
+            session is fresh
+        :return: result of func
+        :raise: DatabaseUnavailable
+        """
+        if _guarded.get():
+            return await func()
+        retryable = idempotent and self._session_is_fresh(session)
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            token = _guarded.set(True)
+            try:
+                result = await func()
+            except DatabaseUnavailable:
+                raise  # already counted, db didn't answer
+            except Exception as err:
+                if not is_transient(err):
+                    self.breaker.record_success()  # db answered
+                    raise
+                if (
+                    not retryable
+                    or attempt >= self.attempts
+                    # pool exhausted, retry would only wait longer
+                    or isinstance(err, exc.TimeoutError)
+                ):
+                    self.breaker.record_failure()
+                    logger.error("Database call failed: {error}", error=err)
+                    raise DatabaseUnavailable(
+                        "Database is unavailable", self.breaker.retry_after()
+                    ) from err
+                db_retries.inc()
+                if session is not None:
+                    try:
+                        await session.rollback()
+                    except Exception:
+                        pass  # invalidated connection is dropped anyway
+                await asyncio.sleep(self.backoff(attempt))
+                continue
+            finally:
+                _guarded.reset(token)
+            self.breaker.record_success()
+            return result
+
+
+    async def stream(
+        self,
+        items: AsyncGenerator[T, None],
+        step: Callable[[], ContextManager] = nullcontext,
+    ) -> AsyncIterator[T]:
+        """
+        guard iteration of async iterator reading rows from db (server side cursor):
+        breaker is checked before first row, connection error on any row fails the
+        stream with DatabaseUnavailable. Streams are never retried, rows already
+        given to consumer can't be taken back
+        :param items: async generator making db calls on every step
+        :param step: context manager factory entered around every step, ex: reading
+        :return: async iterator of items
+        """
+        # nested in guarded call, outer call reports to breaker
+        guarded = not _guarded.get()
+        if guarded:
+            self.breaker.before_call()
+        answered = False
+        try:
+            while True:
+                token = _guarded.set(True)
+                try:
+                    with step():
+                        item = await items.__anext__()
+                except StopAsyncIteration:
+                    break
+                except DatabaseUnavailable:
+                    raise
+                except Exception as err:
+                    if not guarded:
+                        raise
+                    if not is_transient(err):
+                        self.breaker.record_success()  # db answered
+                        raise
+                    self.breaker.record_failure()
+                    logger.error("Database stream failed: {error}", error=err)
+                    raise DatabaseUnavailable(
+                        "Database is unavailable", self.breaker.retry_after()
+                    ) from err
+                finally:
+                    _guarded.reset(token)
+                if guarded and not answered:
+                    self.breaker.record_success()
+                    answered = True
+                yield item
+        finally:
+            await items.aclose()
+        if guarded and not answered:
+            self.breaker.record_success()
+
+
+db_breaker = CircuitBreaker(
+    settings.DB_BREAKER_FAILURE_THRESHOLD, settings.DB_BREAKER_RESET_SECONDS
+)
+db_guard = DatabaseGuard(
+    db_breaker,
+    attempts=settings.DB_RETRY_ATTEMPTS,
+    base_delay=settings.DB_RETRY_BASE_DELAY_SECONDS,
+    max_delay=settings.DB_RETRY_MAX_DELAY_SECONDS,
+)
+
+registry.gauge(
+    "db_circuit_open",
+    "1 while db circuit breaker fails calls fast, 0.5 half open, 0 closed",
+    function=lambda: {
+        CircuitBreaker.CLOSED: 0,
+        CircuitBreaker.HALF_OPEN: 0.5,
+        CircuitBreaker.OPEN: 1,
+    }[db_breaker.state],
+)
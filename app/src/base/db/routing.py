@@ -0,0 +1,243 @@
+import asyncio
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from logger import logger
+
+# zero while replica has replayed everything it received, else age of last replayed
+# transaction; null on primary, so primary can stand in for replica
+REPLICA_LAG = text(
+    "select coalesce(case when pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "then 0 else extract(epoch from now() - pg_last_xact_replay_timestamp()) end, 0)"
+)
+
+# True - selects may go to replica, False - pinned to primary by outer call
+_reading: ContextVar[Optional[bool]] = ContextVar("reading", default=None)
+
+
+@contextmanager
+def reading() -> Iterator[None]:
+    """
+    statements executed inside may go to replica: with reading(): await db.execute(...)
+    unless outer on_primary() keeps them on primary
+    """
+    token = _reading.set(_reading.get() is not False)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+@contextmanager
+def on_primary() -> Iterator[None]:
+    """
+    statements executed inside go to primary, nested reading() included:
+    reads of CRUD method which then writes must see the latest state
+    """
+    token = _reading.set(False)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+def share_read_bind(source, target) -> None:
+    """
+    make target session read from the same engine as source does, ex: page streamed
+    by own session must not be older than inventory version read by request session
+    :param source: AsyncSession
+    :param target: AsyncSession
+    """
+    if "read_bind" in source.info:
+        target.info["read_bind"] = source.info["read_bind"]
+
+
+class Replica:
+    """
+    Replica engine and its last measured lag
+    """
+
+    __slots__ = ("name", "engine", "lag", "checked_at")
+
+    def __init__(self, name: str, engine: AsyncEngine):
+        """
+        :param name: str - shown in stats, url without password
+        :param engine: AsyncEngine
+        """
+        self.name = name
+        self.engine = engine
+        self.lag: Optional[float] = None  # None - not checked yet or unreachable
+        self.checked_at: Optional[float] = None
+
+
+class ReplicaRouter:
+    """
+    Chooses engine for statements of RoutingSession: selects made inside reading()
+    go to a replica lagging less than max_lag, picked round robin by the first such
+    select of session and kept for the rest of it (session.info["read_bind"]), so
+    reads of one session never go back in time. Everything else goes to
+    primary: writes, every read after a write in the same session and all reads of
+    sessions marked info["primary"] (requests with unsafe methods, which load rows
+    to change them). After a write the client reads from primary for sticky_seconds
+    too, so it sees its own changes.
+    Stickiness is kept in memory of this process by client key (remote address):
+    with several workers a client may hit one that hasn't seen its write, and behind
+    a proxy all clients share one key, so one write pins everybody to primary
+    """
+
+    def __init__(
+        self,
+        replicas: List[Replica],
+        max_lag: float = 5,
+        sticky_seconds: float = 10,
+        check_interval: float = 5,
+    ):
+        """
+        :param replicas: list of Replica, empty - routing is off
+        :param max_lag: float - seconds, more lagging replicas are skipped
+        :param sticky_seconds: float - seconds client reads from primary after write
+        :param check_interval: float - seconds between lag checks
+        """
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.check_interval = check_interval
+        self._sticky: Dict[str, float] = {}
+        self._next = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def healthy(self) -> List[Replica]:
+        return [
+            replica
+            for replica in self.replicas
+            if replica.lag is not None and replica.lag <= self.max_lag
+        ]
+
+    def mark_write(self, client: Optional[str]) -> None:
+        """
+        :param client: str - client key (address), None - not a request
+        """
+        if client is None or not self.enabled:
+            return
+        now = time.monotonic()
+        if len(self._sticky) > 10000:
+            self._sticky = {
+                key: until for key, until in self._sticky.items() if until > now
+            }
+        self._sticky[client] = now + self.sticky_seconds
+
+    def is_sticky(self, client: Optional[str]) -> bool:
+        until = self._sticky.get(client) if client is not None else None
+        return until is not None and until > time.monotonic()
+
+    def route(self, session: Session, clause=None) -> Optional[AsyncEngine]:
+        """
+        :param session: Session
+        :param clause: executed statement, None on flush
+        :return: AsyncEngine of replica or None for primary
+        """
+        if not self.enabled:
+            return None
+        if session._flushing or getattr(clause, "is_dml", False):
+            session.info["wrote"] = True
+            self.mark_write(session.info.get("client"))
+            return None
+        if (
+            not _reading.get()
+            or not getattr(clause, "is_select", False)
+            or session.info.get("wrote")
+            or session.info.get("primary")
+        ):
+            return None
+        if "read_bind" not in session.info:
+            replicas = self.healthy()
+            if not replicas or self.is_sticky(session.info.get("client")):
+                session.info["read_bind"] = None
+            else:
+                session.info["read_bind"] = replicas[
+                    next(self._next) % len(replicas)
+                ].engine
+        return session.info["read_bind"]
+
+    async def check(self) -> None:
+        """
+        measure lag of every replica, unreachable ones get None
+        """
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as connection:
+                    lag = float((await connection.execute(REPLICA_LAG)).scalar())
+            except Exception as err:
+                if replica.lag is not None:
+                    logger.warning(
+                        "Replica {name} is unreachable: {error}",
+                        name=replica.name,
+                        error=err,
+                    )
+                lag = None
+            replica.lag = lag
+            replica.checked_at = time.time()
+
+    async def _check_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    async def start(self) -> None:
+        """
+        check replicas once and keep checking in background
+        """
+        if not self.enabled:
+            return
+        await self.check()
+        self._task = asyncio.create_task(self._check_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> List[dict]:
+        return [
+            {
+                "name": replica.name,
+                "lag": replica.lag,
+                "healthy": replica in self.healthy(),
+                "checked_at": replica.checked_at,
+                "checked_out": replica.engine.pool.checkedout(),
+            }
+            for replica in self.replicas
+        ]
+
+
+class RoutingSession(Session):
+    """
+    Session sending statements to engine chosen by its router,
+    sync_session_class of AsyncSession
+    """
+
+    def __init__(self, *args, router: Optional[ReplicaRouter] = None, **kwargs):
+        """
+        :param router: ReplicaRouter, None - everything goes to bind
+        """
+        super().__init__(*args, **kwargs)
+        self.router = router
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.router is not None:
+            replica = self.router.route(self, clause)
+            if replica is not None:
+                return replica.sync_engine
+        return super().get_bind(mapper, clause=clause, **kwargs)
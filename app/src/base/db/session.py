@@ -1,20 +1,273 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import asyncio
+import time
+from typing import Callable, Optional
+
+from fastapi import Request
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, DeclarativeMeta
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.src.base.core.config import settings
+from app.src.base.db.routing import Replica, ReplicaRouter, RoutingSession
+from app.src.base.metrics import db_pool_wait, registry
+
+
+pool_events = registry.counter(
+    "db_pool_events_total",
+    "Pool checkouts, checkout timeouts and pre-pings by result",
+    ("event",),
+)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Pool observing how long checkouts wait for a free connection, only checkouts
+    which found pool exhausted (no idle connection, no overflow left) are observed
+    """
+
+    def _do_get(self):
+        exhausted = (
+            self._pool.empty()
+            and self._max_overflow > -1
+            and self._overflow >= self._max_overflow
+        )
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_events.inc(event="timeout")
+            raise
+        finally:
+            if exhausted:
+                db_pool_wait.observe(time.perf_counter() - started)
+
+
+def build_engine(
+    url: str = settings.SQLALCHEMY_DATABASE_URI,
+    pool_size: int = settings.DB_POOL_SIZE,
+    max_overflow: int = settings.DB_MAX_OVERFLOW,
+    pool_timeout: float = settings.DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle: int = settings.DB_POOL_RECYCLE_SECONDS,
+    pre_ping: str = settings.DB_POOL_PRE_PING,
+    pre_ping_idle: float = settings.DB_POOL_PRE_PING_IDLE_SECONDS,
+    statement_cache_size: int = settings.DB_STATEMENT_CACHE_SIZE,
+) -> AsyncEngine:
+    """
+    create engine with pool configured by settings
+    :param url: str - database url
+    :param pool_size: int - connections kept open
+    :param max_overflow: int - extra connections opened under load
+    :param pool_timeout: float - seconds to wait for free connection
+    :param pool_recycle: int - seconds, older connections are reopened, -1 - never
+    :param pre_ping: str - always | idle | never, when connection is checked on
+        checkout: always costs a round trip per checkout, idle pings only connections
+        unused for pre_ping_idle seconds (those are dropped by server or firewall)
+    :param pre_ping_idle: float - seconds
+    :param statement_cache_size: int - prepared statements cached per connection
+        by asyncpg dialect, 0 - off (pgbouncer in transaction mode)
+    :return: AsyncEngine
+    """
+    if pre_ping not in ("always", "idle", "never"):
+        raise ValueError(f"Unknown pre ping strategy: {pre_ping}")
+    db_engine = create_async_engine(
+        url,
+        pool_pre_ping=pre_ping == "always",
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        poolclass=TimedQueuePool,
+        connect_args={"prepared_statement_cache_size": statement_cache_size},
+    )
+    pool = db_engine.sync_engine.pool
+
+    @event.listens_for(pool, "checkin")
+    def remember_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(pool, "checkout")
+    def check_idle_connection(dbapi_connection, connection_record, connection_proxy):
+        pool_events.inc(event="checkout")
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if pre_ping != "idle" or checked_in_at is None:
+            return
+        if time.monotonic() - checked_in_at < pre_ping_idle:
+            return
+        try:
+            db_engine.dialect.do_ping(dbapi_connection)
+        except Exception as err:
+            pool_events.inc(event="ping_failed")
+            # pool reconnects and retries checkout
+            raise exc.DisconnectionError("idle connection is dead") from err
+        pool_events.inc(event="ping")
+
+    return db_engine
+
 
 database_url = settings.SQLALCHEMY_DATABASE_URI
-engine = create_async_engine(
-    settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True, pool_size=10, max_overflow=20
+engine = build_engine()
+
+replica_router = ReplicaRouter(
+    [
+        Replica(make_url(url).render_as_string(hide_password=True), build_engine(url))
+        for url in (url.strip() for url in settings.DB_REPLICA_URIS.split(","))
+        if url
+    ],
+    max_lag=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    sticky_seconds=settings.DB_READ_YOUR_WRITES_SECONDS,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL_SECONDS,
 )
 
 Base: DeclarativeMeta = declarative_base()
-async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+async_session = sessionmaker(
+    engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    router=replica_router,
+    expire_on_commit=False,
+)
 
 
-async def get_session() -> AsyncSession:
-    async with async_session() as session:
-        yield session
+def pool_stats(db_engine: AsyncEngine = engine) -> dict:
+    """
+    :param db_engine: AsyncEngine
+    :return: dict - current pool state and totals of checkouts which had to wait
+    """
+    pool = db_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "timeout": pool.timeout(),
+        "waits": db_pool_wait.get_count(),
+        "wait_seconds_total": round(db_pool_wait.get_sum(), 6),
+        "checkouts": pool_events.get(event="checkout"),
+        "timeouts": pool_events.get(event="timeout"),
+        "pings": pool_events.get(event="ping"),
+        "failed_pings": pool_events.get(event="ping_failed"),
+        "replicas": replica_router.stats() if db_engine is engine else [],
+    }
+
+
+async def warm_up_pool(count: int, db_engine: AsyncEngine = engine) -> int:
+    """
+    open count connections at once and return them to pool, so first requests
+    after start don't pay for connecting
+    :param count: int - capped by pool size
+    :param db_engine: AsyncEngine
+    :return: int - count of opened connections
+    """
+    count = min(count, db_engine.pool.size())
+    if count <= 0:
+        return 0
+    results = await asyncio.gather(
+        *(db_engine.connect().start() for _ in range(count)), return_exceptions=True
+    )
+    opened = [result for result in results if not isinstance(result, BaseException)]
+    for connection in opened:
+        await connection.close()  # back to pool, stays open
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        raise errors[0]
+    return len(opened)
+
+
+registry.gauge(
+    "db_pool_size", "Configured size of db pool", function=lambda: engine.pool.size()
+)
+registry.gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out from db pool",
+    function=lambda: engine.pool.checkedout(),
+)
+registry.gauge(
+    "db_pool_checked_in",
+    "Idle connections in db pool",
+    function=lambda: engine.pool.checkedin(),
+)
+registry.gauge(
+    "db_pool_overflow",
+    "Connections opened over pool size (negative while pool is not filled)",
+    function=lambda: engine.pool.overflow(),
+)
+
+
+class LazySession:
+    """
+    Stand-in for AsyncSession given to request handlers: real session is created
+    on first attribute access, so requests which never touch db (anonymous page
+    views) don't build and close a session at all.
+    AsyncSession itself checks connection out of pool only on first statement
+    and returns it on commit or rollback
+    """
+
+    __slots__ = ("_factory", "_session")
+
+    def __init__(self, factory: Callable[[], AsyncSession]):
+        """
+        :param factory: callable returning new AsyncSession
+        """
+        self._factory = factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def created(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str):
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
+async def release_connection(session: AsyncSession) -> None:
+    """
+    end clean read only transaction, so connection goes back to pool now and not
+    when request ends; loaded objects stay usable as sessions don't expire on commit
+    :param session: AsyncSession or LazySession
+    """
+    if isinstance(session, LazySession) and not session.created:
+        return
+    if session.info.get("pending_writes"):
+        return  # flushed changes of unit of work are committed by the route
+    if session.in_transaction() and not (
+        session.new or session.dirty or session.deleted
+    ):
+        await session.commit()
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+async def get_session(request: Request) -> AsyncSession:
+    """
+    request session, inside UnitOfWorkRoute it is committed once by the route
+    :param request: fastapi.Request
+    :return: LazySession
+    """
+
+    def create_session() -> AsyncSession:
+        session = async_session()
+        session.info["unit_of_work"] = getattr(request.state, "unit_of_work", False)
+        # read-your-writes stickiness key for replica routing
+        session.info["client"] = request.client.host if request.client else None
+        # rows loaded by unsafe requests are changed next, read them from primary
+        session.info["primary"] = request.method not in SAFE_METHODS
+        return session
+
+    lazy_session = LazySession(create_session)
+    request.state.db_session = lazy_session
+    try:
+        yield lazy_session
+    finally:
+        await lazy_session.close()
 
 
 async def get_session_() -> AsyncSession:
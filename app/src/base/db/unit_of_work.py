@@ -0,0 +1,77 @@
+from typing import Any, Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class UnitOfWorkRoute(APIRoute):
+    """
+    Route class making request session a unit of work: CRUD methods only flush,
+    and all changes are committed once when handler returns (one transaction,
+    one round trip and fsync per request) or rolled back when it raises.
+    Routes needing intermediate commits opt out with without_unit_of_work
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def unit_of_work_handler(request: Request) -> Response:
+            request.state.unit_of_work = True
+            try:
+                response = await handler(request)
+            except BaseException:
+                await finish_unit_of_work(request, commit=False)
+                raise
+            await finish_unit_of_work(request, commit=True)
+            return response
+
+        return unit_of_work_handler
+
+
+async def finish_unit_of_work(request: Request, commit: bool) -> None:
+    """
+    commit or roll back request session if it was used, transaction without
+    writes is rolled back, so broken connection of failed read can't fail response.
+    Callbacks queued by after_commit run only after successful commit
+    :param request: fastapi.Request
+    :param commit: bool
+    """
+    session = getattr(request.state, "db_session", None)
+    if session is None or not session.created:
+        return
+    callbacks = session.info.pop("after_commit", [])
+    if session.in_transaction():
+        writes = session.info.get("pending_writes") or session.new or session.dirty
+        if commit and session.info.get("unit_of_work") and writes:
+            await session.commit()
+        else:
+            await session.rollback()
+    if commit:
+        for callback, args in callbacks:
+            callback(*args)
+
+
+def after_commit(session: AsyncSession, callback: Callable, *args: Any) -> None:
+    """
+    run callback (event publishing etc.) once changes of unit of work are committed,
+    dropped if they are rolled back; without unit of work it runs at once, CRUD
+    methods have committed already
+    :param session: AsyncSession of request
+    :param callback: callable
+    :param args: callback arguments
+    """
+    if session.info.get("unit_of_work"):
+        session.info.setdefault("after_commit", []).append((callback, args))
+    else:
+        callback(*args)
+
+
+async def without_unit_of_work(request: Request) -> None:
+    """
+    dependency turning unit of work off, CRUD methods commit on their own again:
+    @router.post("/...", dependencies=[Depends(without_unit_of_work)]),
+    must be resolved before request session is first used
+    :param request: fastapi.Request
+    """
+    request.state.unit_of_work = False
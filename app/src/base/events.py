@@ -0,0 +1,97 @@
+import asyncio
+import json
+from collections import deque
+from typing import AsyncIterator, Optional, Set
+
+
+def format_sse(event_id: int, event: str, data: str) -> str:
+    """
+    :param event_id: int
+    :param event: str - event type
+    :param data: str - json
+    :return: str - one Server-Sent Events message
+    """
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class EventBroker:
+    """
+    In-process fan-out of events to Server-Sent Events subscribers.
+    Every subscriber has own bounded queue, subscriber too slow to read
+    gets "reset" event (reload everything) instead of blocking publishers.
+    Recent events are kept, so reconnecting clients resume from Last-Event-ID
+    """
+
+    def __init__(self, history_size: int = 256, queue_size: int = 256):
+        """
+        :param history_size: int - count of recent events kept for resume
+        :param queue_size: int - max not sent events per subscriber
+        """
+        self.queue_size = queue_size
+        self._history: deque = deque(maxlen=history_size)
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._last_id = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: dict) -> int:
+        """
+        send event to all subscribers, never blocks, must be called from event loop thread
+        :param event: str - event type
+        :param data: dict - json serializable payload
+        :return: int - event id
+        """
+        self._last_id += 1
+        message = (self._last_id, event, json.dumps(data, default=str))
+        self._history.append(message)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._reset(queue)
+        return self._last_id
+
+    def _reset(self, queue: asyncio.Queue) -> None:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait((self._last_id, "reset", "{}"))
+
+    def _missed(self, last_event_id: Optional[int]) -> list:
+        if last_event_id is None or last_event_id == self._last_id:
+            return []
+        missed = [message for message in self._history if message[0] > last_event_id]
+        if (
+            last_event_id > self._last_id  # ids are from before server restart
+            or not self._history  # history is off (size 0)
+            or last_event_id < self._history[0][0] - 1
+            or len(missed) > self.queue_size
+        ):
+            return [(self._last_id, "reset", "{}")]  # gap can't be replayed
+        return missed
+
+    async def stream(
+        self, last_event_id: Optional[int] = None, heartbeat: float = 15
+    ) -> AsyncIterator[str]:
+        """
+        yield SSE messages until consumer stops iterating
+        :param last_event_id: int - id of last event seen by client, missed ones are replayed
+        :param heartbeat: float - seconds, comment is sent when idle to keep connection open
+        :return: async iterator of str
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        for message in self._missed(last_event_id):
+            queue.put_nowait(message)
+        self._subscribers.add(queue)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(*message)
+        finally:
+            self._subscribers.discard(queue)
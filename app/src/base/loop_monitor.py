@@ -0,0 +1,122 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import List, Optional
+
+from app.src.base.core import settings
+from app.src.base.metrics import registry
+from logger import logger
+
+loop_lag = registry.histogram(
+    "event_loop_lag_seconds",
+    "Delay between planned and real wake up of monitor coroutine",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+loop_blocked = registry.counter(
+    "event_loop_blocked_total", "Count of event loop stalls longer than threshold"
+)
+
+
+class LoopLagMonitor:
+    """
+    Coroutine sleeping for interval measures how late the loop wakes it up (lag metric)
+    and leaves heartbeat. Watchdog thread checks heartbeat, when loop doesn't answer
+    longer than threshold the stack of loop thread is captured while it is still
+    blocked, so report points right at the blocking call
+    """
+
+    def __init__(
+        self, interval: float = 0.1, threshold: float = 0.25, history_size: int = 50
+    ):
+        """
+        :param interval: float - seconds between samples
+        :param threshold: float - seconds, longer stall is reported with stack
+        :param history_size: int - count of recent stall reports kept
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: deque = deque(maxlen=history_size)
+        self._beat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        start sampling on running loop and watchdog thread
+        """
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self.interval * 2)
+
+    async def _sample(self) -> None:
+        while True:
+            started = self._loop.time()
+            await asyncio.sleep(self.interval)
+            loop_lag.observe(max(self._loop.time() - started - self.interval, 0))
+            self._beat = time.monotonic()
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            blocked_for = time.monotonic() - beat - self.interval
+            if blocked_for < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat  # one report per stall
+            self.report(blocked_for)
+
+    def report(self, blocked_for: float) -> dict:
+        """
+        capture what loop thread is doing now, called from watchdog thread
+        :param blocked_for: float - seconds loop hasn't answered
+        :return: dict - stall report
+        """
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame) if frame is not None else []
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        stall = {
+            "at": datetime.utcnow().isoformat(),
+            "blocked_for": round(blocked_for, 3),
+            "task": task.get_name() if task is not None else None,
+            "stack": [line.rstrip() for line in stack],
+        }
+        self.stalls.append(stall)
+        loop_blocked.inc()
+        logger.warning(
+            "Event loop blocked for {blocked_for}s in task {task}:\n{stack}",
+            blocked_for=stall["blocked_for"],
+            task=stall["task"],
+            stack="".join(stack[-8:]),
+        )
+        return stall
+
+    def recent(self) -> List[dict]:
+        """
+        :return: list of recent stall reports, newest first
+        """
+        return list(reversed(self.stalls))
+
+
+loop_monitor = LoopLagMonitor(
+    settings.LOOP_MONITOR_INTERVAL_SECONDS, settings.LOOP_MONITOR_THRESHOLD_SECONDS
+)
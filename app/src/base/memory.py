@@ -0,0 +1,143 @@
+import gc
+import threading
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# allocations of tracemalloc itself and of imports are noise in diffs
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class MemoryProfiler:
+    """
+    Wrapper over tracemalloc for diagnostics endpoints: start/stop tracing,
+    keep a few numbered snapshots and compare them. Nothing is traced until start(),
+    so there is no overhead while it is disabled
+    """
+
+    def __init__(self, max_snapshots: int = 5):
+        """
+        :param max_snapshots: int - oldest snapshots are dropped, each one holds
+            all traces in memory
+        """
+        self.max_snapshots = max_snapshots
+        self.snapshots: "OrderedDict[int, tuple[str, tracemalloc.Snapshot]]" = (
+            OrderedDict()
+        )
+        self._last_id = 0
+        # snapshots are taken and compared in worker threads
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> None:
+        """
+        :param frames: int - stored traceback depth, more frames cost more memory
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        """
+        stop tracing and free traces and snapshots
+        """
+        tracemalloc.stop()
+        with self._lock:
+            self.snapshots.clear()
+
+    def snapshot(self) -> dict:
+        """
+        take snapshot of current allocations
+        :return: dict - snapshot id, time and traced size
+        :raise: RuntimeError if tracing is not started
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not started")
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        taken_at = datetime.utcnow().isoformat()
+        with self._lock:
+            self._last_id += 1
+            snapshot_id = self._last_id
+            self.snapshots[snapshot_id] = (taken_at, snapshot)
+            while len(self.snapshots) > self.max_snapshots:
+                self.snapshots.popitem(last=False)
+        return {
+            "id": snapshot_id,
+            "taken_at": taken_at,
+            "size": sum(stat.size for stat in snapshot.statistics("filename")),
+        }
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return [
+                {"id": snapshot_id, "taken_at": taken_at}
+                for snapshot_id, (taken_at, _) in self.snapshots.items()
+            ]
+
+    def diff(
+        self,
+        base_id: Optional[int] = None,
+        target_id: Optional[int] = None,
+        group_by: str = "lineno",
+        top: int = 20,
+    ) -> List[dict]:
+        """
+        top allocation differences between two snapshots
+        :param base_id: int - older snapshot, the oldest kept by default
+        :param target_id: int - newer snapshot, the latest by default
+        :param group_by: str - filename | lineno | traceback
+        :param top: int
+        :return: list of dicts sorted by size growth
+        :raise: KeyError if snapshot is missing
+        """
+        with self._lock:
+            if not self.snapshots:
+                raise KeyError("no snapshots")
+            if base_id is None:
+                base_id = next(iter(self.snapshots))
+            if target_id is None:
+                target_id = next(reversed(self.snapshots))
+            base = self.snapshots[base_id][1]
+            target = self.snapshots[target_id][1]
+        rows = []
+        for stat in target.compare_to(base, group_by)[:top]:
+            frame = stat.traceback[0]
+            row = {
+                "location": frame.filename if group_by == "filename" else str(frame),
+                "size_diff": stat.size_diff,
+                "size": stat.size,
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+            }
+            if group_by == "traceback":
+                row["traceback"] = [str(frame) for frame in stat.traceback]
+            rows.append(row)
+        return rows
+
+
+def count_instances(classes: Iterable[type]) -> Dict[str, int]:
+    """
+    count live objects of given classes (ORM models etc.), walks whole gc heap,
+    so it's for diagnostics only
+    :param classes: classes, subclasses are counted too
+    :return: dict - class name -> count
+    """
+    classes = tuple(classes)
+    counts = {cls.__name__: 0 for cls in classes}
+    for obj in gc.get_objects():
+        if isinstance(obj, classes):
+            for cls in classes:
+                if isinstance(obj, cls):
+                    counts[cls.__name__] += 1
+    return counts
+
+
+memory_profiler = MemoryProfiler()
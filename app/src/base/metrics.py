@@ -0,0 +1,338 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CONTENT_TYPE = "text/plain; version=0.0.4"  # charset is added by Response
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Metric:
+    """
+    Base of metrics kept by Registry, values are stored per label values tuple
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        """
+        :param name: str - metric name, e.g. http_request_duration_seconds
+        :param documentation: str - HELP text
+        :param labelnames: label names, values must be passed to every update
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(Metric):
+    """
+    Gauge set explicitly or read from function on every scrape (pool size etc.)
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        function: Optional[Callable[[], float]] = None,
+    ):
+        """
+        :param function: callable without arguments, used instead of set() values
+        """
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels) -> float:
+        if self.function is not None:
+            return self.function()
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            return [f"{self.name} {_format_value(self.function())}"]
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """
+        :param buckets: upper bounds of buckets, +Inf is added automatically
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [counts per bucket (not cumulative), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        with histogram.time(method="get"): ... - observe duration of block in seconds
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def get_count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def get_sum(self, **labels) -> float:
+        state = self._values.get(self._key(labels))
+        return state[1] if state else 0.0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [
+                (key, list(state[0]), state[1], state[2])
+                for key, state in self._values.items()
+            ]
+        names = self.labelnames + ("le",)
+        lines = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """
+    In-process metrics registry rendered in Prometheus text format
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        add metric, registering the same name twice returns the first one
+        (modules may be imported again by reloader)
+        :param metric: Metric
+        :return: registered Metric
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        function: Optional[Callable[[], float]] = None,
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        :return: str - all metrics in Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+_route_templates: dict = {}  # endpoint -> path template
+
+
+def route_template(scope: Scope) -> str:
+    """
+    :param scope: ASGI scope after routing
+    :return: str - path template of matched route (/disks/{disk_id}) or <unmatched>
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "<unmatched>"
+    path = _route_templates.get(endpoint)
+    if path is None:
+        for route in getattr(scope.get("app"), "routes", ()):
+            target = getattr(route, "endpoint", None) or getattr(route, "app", None)
+            if target is endpoint:
+                path = route.path
+                break
+        else:
+            path = "<unmatched>"
+        _route_templates[endpoint] = path
+    return path
+
+
+class MetricsMiddleware:
+    """
+    Observes duration of every http request labelled by method, route template
+    (not raw path, so /disks/1 and /disks/2 are one series) and status code
+    """
+
+    def __init__(self, app: ASGIApp, histogram: Histogram = None):
+        """
+        :param app: ASGI app
+        :param histogram: Histogram with method, route and status labels
+        """
+        self.app = app
+        self.histogram = histogram or http_request_duration
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # app failed before response was started
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.histogram.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=route_template(scope),
+                status=status,
+            )
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Duration of http requests",
+    ("method", "route", "status"),
+)
+crud_duration = registry.histogram(
+    "crud_operation_duration_seconds",
+    "Duration of CRUD methods including db round trips",
+    ("crud", "method"),
+)
+shell_command_duration = registry.histogram(
+    "shell_command_duration_seconds",
+    "Duration of shell commands run by run_shell_command",
+    ("command", "exit_code"),
+)
+db_pool_wait = registry.histogram(
+    "db_pool_wait_seconds",
+    "Time checkouts waited for connection of exhausted SQLAlchemy pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30),
+)
@@ -0,0 +1,202 @@
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.src.base.core import settings
+
+PROFILE_NAME = re.compile(r"^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$")
+
+
+class ProfileStore:
+    """
+    Folder of saved profiles: <name>.prof (pstats dump) and <name>.json (request info),
+    only max_files newest profiles are kept
+    """
+
+    def __init__(self, directory: str, max_files: int = 200):
+        """
+        :param directory: str
+        :param max_files: int
+        """
+        self.directory = directory
+        self.max_files = max_files
+
+    @staticmethod
+    def new_name() -> str:
+        # sortable by time
+        return f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+
+    def path(self, name: str, suffix: str = ".prof") -> Optional[str]:
+        """
+        :param name: str - profile name
+        :param suffix: str - .prof or .json
+        :return: str - path of existing file or None, names from users are validated
+        """
+        if not PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name + suffix)
+        return path if os.path.isfile(path) else None
+
+    def save(self, name: str, profiler: cProfile.Profile, info: dict) -> None:
+        """
+        write profile and its info, blocking - run it in executor
+        :param name: str
+        :param profiler: cProfile.Profile - already disabled
+        :param info: dict - method, path, duration etc.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(self.directory, name + ".prof"))
+        with open(os.path.join(self.directory, name + ".json"), "w") as file:
+            json.dump(dict(info, name=name), file)
+        self.trim()
+
+    def list(self) -> List[dict]:
+        """
+        :return: list of profile infos, newest first
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        infos = []
+        for filename in sorted(os.listdir(self.directory), reverse=True):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as file:
+                    infos.append(json.load(file))
+            except (OSError, ValueError):
+                continue  # being written or removed right now
+        return infos
+
+    def stats(
+        self, name: str, sort: str = "cumulative", limit: int = 50
+    ) -> Optional[str]:
+        """
+        :param name: str
+        :param sort: str - pstats sort key
+        :param limit: int - count of printed functions
+        :return: str - human readable stats or None if profile is missing
+        """
+        path = self.path(name)
+        if path is None:
+            return None
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def trim(self) -> None:
+        names = sorted(
+            filename[:-5]
+            for filename in os.listdir(self.directory)
+            if filename.endswith(".prof")
+        )
+        for name in names[: max(len(names) - self.max_files, 0)]:
+            for suffix in (".prof", ".json"):
+                try:
+                    os.remove(os.path.join(self.directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests with cProfile: always when authorised client sends the header,
+    and randomly sampled requests, which are kept only if they were slower than threshold.
+    cProfile sees the whole event loop thread, so profile also contains work of
+    concurrent requests; only one request is profiled at a time
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        authorize: Callable[[Request], Awaitable[bool]],
+        header: str = "X-Profile",
+        sample_rate: float = 0.0,
+        slow_threshold: float = 1.0,
+    ):
+        """
+        :param app: ASGI app
+        :param store: ProfileStore
+        :param authorize: async callable, is request allowed to ask for profile
+        :param header: str - request header asking for profile, its name is answered
+            in the same response header
+        :param sample_rate: float 0-1 - share of requests profiled in background
+        :param slow_threshold: float - seconds, sampled profiles faster than it are dropped
+        """
+        self.app = app
+        self.store = store
+        self.authorize = authorize
+        self.header = header
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.active = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.active:
+            await self.app(scope, receive, send)
+            return
+        requested = self.header in Headers(scope=scope) and await self.authorize(
+            Request(scope)
+        )
+        if not requested and not (
+            self.sample_rate and random.random() < self.sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+        if self.active:  # other request started profiling while this was authorized
+            await self.app(scope, receive, send)
+            return
+        await self._profile(scope, receive, send, requested)
+
+    async def _profile(
+        self, scope: Scope, receive: Receive, send: Send, requested: bool
+    ) -> None:
+        name = self.store.new_name()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if requested:
+                    MutableHeaders(scope=message)[self.header] = name
+            await send(message)
+
+        self.active = True
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - started
+            self.active = False
+            if requested or duration >= self.slow_threshold:
+                info = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round(duration * 1000, 3),
+                    "reason": "requested" if requested else "slow",
+                    "created_at": datetime.utcnow().isoformat(),
+                }
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.store.save, name, profiler, info
+                )
+
+
+profile_store = ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_FILES)
@@ -0,0 +1,160 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import sys
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # optional, only gzip copies are built without it
+    brotli = None
+
+from app.src.base.core import settings
+
+COMPRESSIBLE = {".css", ".js", ".html", ".svg", ".json", ".txt", ".map"}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class StaticAssets:
+    """
+    Copies static files into build dir under content hash names
+    (css/styles.css -> css/styles.<hash>.css) with .gz siblings, .br ones only
+    when optional brotli package is installed, and resolves source paths into
+    fingerprinted urls
+    """
+
+    def __init__(self, source_dir: str, build_dir: str, url_prefix: str = "/static"):
+        """
+        :param source_dir: str - folder with original files
+        :param build_dir: str - folder served by PrecompressedStaticFiles
+        :param url_prefix: str - path static app is mounted on
+        """
+        self.source_dir = source_dir
+        self.build_dir = build_dir
+        self.url_prefix = url_prefix
+        self.manifest: Dict[str, str] = {}
+        self.fingerprinted = set()
+
+    def build(self) -> Dict[str, str]:
+        """
+        fingerprint and precompress all files of source dir, safe to run by several
+        workers at once: files are written to temp names and renamed
+        :return: dict - source path -> fingerprinted path
+        """
+        manifest = {}
+        for root, _, files in os.walk(self.source_dir):
+            for filename in files:
+                source = os.path.join(root, filename)
+                path = os.path.relpath(source, self.source_dir).replace(os.sep, "/")
+                with open(source, "rb") as file:
+                    data = file.read()
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                base, ext = os.path.splitext(path)
+                hashed = f"{base}.{digest}{ext}"
+                # plain name is kept for urls not going through static_url
+                for target in (path, hashed):
+                    self._write(target, data, compress=ext.lower() in COMPRESSIBLE)
+                manifest[path] = hashed
+        self.manifest = manifest
+        self.fingerprinted = set(manifest.values())
+        return manifest
+
+    def url(self, path: str) -> str:
+        """
+        template helper: static_url('css/styles.css') -> /static/css/styles.<hash>.css
+        :param path: str - path inside source dir
+        :return: str
+        """
+        return f"{self.url_prefix}/{self.manifest.get(path, path)}"
+
+    def is_fingerprinted(self, path: str) -> bool:
+        return path in self.fingerprinted
+
+    def _write(self, path: str, data: bytes, compress: bool) -> None:
+        variants = {"": data}
+        if compress:
+            variants[".gz"] = gzip.compress(data, compresslevel=9, mtime=0)
+            if brotli is not None:
+                variants[".br"] = brotli.compress(data, quality=11)
+        for suffix, content in variants.items():
+            if suffix and len(content) >= len(data):
+                continue  # compression doesn't pay off
+            target = os.path.join(self.build_dir, path + suffix)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temp = f"{target}.{os.getpid()}.tmp"
+            with open(temp, "wb") as file:
+                file.write(content)
+            os.replace(temp, target)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles serving prebuilt .br/.gz copies to clients accepting them,
+    fingerprinted files are marked immutable so browsers never revalidate them
+    """
+
+    encodings = (("br", ".br"), ("gzip", ".gz"))
+
+    def __init__(self, *, assets: StaticAssets, **kwargs):
+        kwargs.setdefault("directory", assets.build_dir)
+        super().__init__(**kwargs)
+        self.assets = assets
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        response = self._compressed_response(full_path, scope, status_code)
+        if response is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Vary"] = "Accept-Encoding"
+        path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        if self.assets.is_fingerprinted(path):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    def _compressed_response(
+        self, full_path, scope: Scope, status_code: int
+    ) -> Optional[Response]:
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        accepted = {
+            value.split(";")[0].strip().lower() for value in accept_encoding.split(",")
+        }
+        for encoding, suffix in self.encodings:
+            compressed = f"{full_path}{suffix}"
+            if encoding not in accepted or not os.path.isfile(compressed):
+                continue
+            response = FileResponse(
+                compressed,
+                status_code=status_code,
+                stat_result=os.stat(compressed),
+                method=scope["method"],
+                media_type=mimetypes.guess_type(str(full_path))[0] or "text/plain",
+            )
+            response.headers["Content-Encoding"] = encoding
+            if self.is_not_modified(response.headers, Headers(scope=scope)):
+                return NotModifiedResponse(response.headers)
+            return response
+        return None
+
+
+static_assets = StaticAssets(settings.STATIC_DIR, settings.STATIC_BUILD_DIR)
+PRECOMPRESSED = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+if __name__ == "__main__":
+    # build step: python -m app.src.base.static
+    built = static_assets.build()
+    sys.stdout.write(
+        f"built {len(built)} static files into {settings.STATIC_BUILD_DIR}, "
+        f"precompressed: {', '.join(PRECOMPRESSED)}\n"
+    )
@@ -0,0 +1,173 @@
+import hashlib
+import os
+from typing import Any, AsyncIterator, Callable, Hashable
+
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache, TemplateSyntaxError, nodes
+from jinja2.ext import Extension
+
+from app.src.base.cache import LRUCache
+from app.src.base.core import settings
+from app.src.base.tracing import tracer
+from logger import logger
+
+
+class FragmentCacheExtension(Extension):
+    """
+    {% cache "name", key1, key2 %}...{% endcache %} - renders block once per key,
+    next renders with the same key return cached html
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_cache_support", [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache_support(self, key: list, caller: Callable[[], str]) -> str:
+        cache: LRUCache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        cache_key: Hashable = tuple(key)
+        html = cache.get(cache_key)
+        if html is not None:
+            return html
+        if self.environment.is_async:
+            return self._render_async(cache, cache_key, caller)
+        html = caller()
+        cache.set(cache_key, html)
+        return html
+
+    async def _render_async(self, cache: LRUCache, cache_key: Hashable, caller) -> str:
+        html = await caller()
+        cache.set(cache_key, html)
+        return html
+
+
+class Templates(Jinja2Templates):
+    """
+    Jinja2Templates with second, async environment used for streaming render.
+    Both environments share loader, globals and fragment cache
+    """
+
+    def __init__(self, directory: str, **env_options: Any):
+        super().__init__(directory=directory, **env_options)
+        # async templates are compiled to other code, so they need own caches
+        self.async_env = self.env.overlay(cache_size=-1, bytecode_cache=None)
+        self.async_env.is_async = True  # overlay(enable_async=) is ignored before jinja 3.1.5
+        self._version = None
+
+    @property
+    def version(self) -> str:
+        """
+        hash of all template sources, part of ETags of rendered pages
+        :return: str
+        """
+        if self._version is None:
+            digest = hashlib.sha1()
+            for name in self.env.list_templates():
+                source, _, _ = self.env.loader.get_source(self.env, name)
+                digest.update(name.encode("utf-8") + source.encode("utf-8"))
+            self._version = digest.hexdigest()[:12]
+        return self._version
+
+    def TemplateResponse(self, name: str, context: dict, *args: Any, **kwargs: Any):
+        with tracer.span("template.render", template=name):
+            return super().TemplateResponse(name, context, *args, **kwargs)
+
+    def StreamingTemplateResponse(
+        self, name: str, context: dict, status_code: int = 200, headers: dict = None
+    ) -> StreamingResponse:
+        """
+        render template chunk by chunk while response is sent, context values
+        can be async iterators, they are consumed as template loops over them
+        :param name: str - template name
+        :param context: dict - must contain "request"
+        :param status_code: int
+        :param headers: dict
+        :return: StreamingResponse
+        """
+        if "request" not in context:
+            raise ValueError('context must include a "request" key')
+        template = self.async_env.get_template(name)
+        chunks = tracer.trace_chunks(
+            "template.render", template.generate_async(context), template=name
+        )
+        return StreamingResponse(
+            buffered(chunks, settings.TEMPLATES_STREAM_CHUNK_SIZE),
+            status_code=status_code,
+            headers=headers,
+            media_type="text/html",
+        )
+
+
+async def buffered(chunks: AsyncIterator[str], size: int) -> AsyncIterator[str]:
+    """
+    join small template chunks, so every socket write sends at least size chars
+    :param chunks: async iterator of str
+    :param size: int
+    :return: async iterator of str
+    """
+    buffer, buffered_size = [], 0
+    async for chunk in chunks:
+        buffer.append(chunk)
+        buffered_size += len(chunk)
+        if buffered_size >= size:
+            yield "".join(buffer)
+            buffer, buffered_size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def create_templates(directory: str = "templates", **env_options: Any) -> Templates:
+    """
+    build Templates with bytecode cache and fragment cache
+    :param directory: str - templates folder
+    :param env_options: extra jinja2.Environment options
+    :return: Jinja2Templates
+    """
+    env_options.setdefault("auto_reload", settings.TEMPLATES_AUTO_RELOAD)
+    if "bytecode_cache" not in env_options:
+        bytecode_dir = settings.TEMPLATES_BYTECODE_CACHE_DIR or None  # None - system tmp
+        if bytecode_dir:
+            os.makedirs(bytecode_dir, exist_ok=True)
+        env_options["bytecode_cache"] = FileSystemBytecodeCache(bytecode_dir)
+    env_options.setdefault("extensions", [FragmentCacheExtension])
+    env_options.setdefault("cache_size", -1)  # never evict compiled templates
+    jinja_templates = Templates(directory=directory, **env_options)
+    fragment_cache = LRUCache(max_size=settings.TEMPLATES_FRAGMENT_CACHE_SIZE)
+    jinja_templates.env.fragment_cache = fragment_cache
+    jinja_templates.async_env.fragment_cache = fragment_cache
+    return jinja_templates
+
+
+def precompile(jinja_templates: Templates) -> int:
+    """
+    load and compile all templates for both environments, so first requests don't pay for it
+    :param jinja_templates: Templates
+    :return: int - count of compiled templates
+    """
+    compiled = 0
+    for name in jinja_templates.env.list_templates(extensions=["html"]):
+        try:
+            jinja_templates.env.get_template(name)
+            jinja_templates.async_env.get_template(name)
+        except TemplateSyntaxError as err:
+            logger.error("Template {name} not compiled: {error}", name=name, error=err)
+            continue
+        compiled += 1
+    return compiled
+
+
+templates = create_templates()
@@ -0,0 +1,457 @@
+import functools
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.src.base.metrics import route_template
+from logger import logger
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+class Span:
+    """
+    One timed operation, spans of one request share trace_id
+    and point to enclosing span by parent_id
+    """
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "kind",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        kind: str = "internal",
+        attributes: dict = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes or {})
+        self.error: Optional[str] = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class SpanExporter:
+    """
+    Sends finished spans somewhere, called from exporting thread with batches
+    """
+
+    def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class JsonFileSpanExporter(SpanExporter):
+    """
+    Appends spans to file as json lines
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: str - file path, folders are created
+        """
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as file:
+            for span in spans:
+                file.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """
+    Posts spans to OpenTelemetry collector in OTLP/HTTP json encoding,
+    failed batches are logged and dropped
+    """
+
+    KINDS = {"internal": 1, "server": 2, "client": 3}
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318/v1/traces",
+        service_name: str = "disk-manager",
+        timeout: float = 5,
+        headers: dict = None,
+    ):
+        """
+        :param endpoint: str - collector traces url
+        :param service_name: str - service.name resource attribute
+        :param timeout: float - seconds
+        :param headers: dict - extra request headers (auth of collector)
+        """
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    @staticmethod
+    def _attribute(key: str, value) -> dict:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def payload(self, spans: List[Span]) -> dict:
+        """
+        :param spans: list of Span
+        :return: dict - ExportTraceServiceRequest
+        """
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": self.KINDS.get(span.kind, 1),
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [
+                    self._attribute(key, value)
+                    for key, value in span.attributes.items()
+                    if value is not None
+                ],
+                "status": {"code": 2, "message": span.error}
+                if span.error
+                else {"code": 1},
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            otlp_spans.append(otlp_span)
+        resource = {"attributes": [self._attribute("service.name", self.service_name)]}
+        scope = {"name": "app.src.base.tracing"}
+        return {
+            "resourceSpans": [
+                {
+                    "resource": resource,
+                    "scopeSpans": [{"scope": scope, "spans": otlp_spans}],
+                }
+            ]
+        }
+
+    def export(self, spans: List[Span]) -> None:
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(self.payload(spans)).encode("utf-8"),
+            headers=self.headers,
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except OSError as err:
+            logger.warning(
+                "Spans not exported to {endpoint}: {error}",
+                endpoint=self.endpoint,
+                error=err,
+            )
+
+
+class BatchSpanProcessor:
+    """
+    Collects finished spans in queue, background thread exports them by batches,
+    so request path never waits for exporter io. Spans are dropped when queue is full
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        batch_size: int = 512,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 10000,
+    ):
+        """
+        :param exporter: SpanExporter
+        :param batch_size: int - max spans per export call
+        :param flush_interval: float - seconds, max time span waits in queue
+        :param max_queue_size: int
+        """
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(
+            target=self._run, name="span-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def on_end(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5) -> None:
+        """
+        wait until all spans queued before the call are exported
+        """
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def shutdown(self, timeout: float = 5) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self.exporter.shutdown()
+
+    def _run(self) -> None:
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = False  # flush by interval
+            if isinstance(item, Span):
+                batch.append(item)
+                if len(batch) < self.batch_size and time.monotonic() < deadline:
+                    continue
+            deadline = time.monotonic() + self.flush_interval
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception as err:  # exporter bugs must not kill the thread
+                    logger.error("Span export failed: {error}", error=err)
+                batch = []
+            if item is None:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Creates spans, current span is kept in contextvar, so children started in the same
+    task (or in tasks created from it) get right parent without passing it around.
+    Without processor tracer is disabled and span() costs almost nothing
+    """
+
+    def __init__(self):
+        self.processor: Optional[BatchSpanProcessor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None
+
+    def configure(self, exporter: SpanExporter, **processor_options) -> None:
+        """
+        :param exporter: SpanExporter
+        :param processor_options: BatchSpanProcessor options
+        """
+        self.shutdown()
+        self.processor = BatchSpanProcessor(exporter, **processor_options)
+
+    def shutdown(self) -> None:
+        if self.processor is not None:
+            self.processor.shutdown()
+            self.processor = None
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return _current_span.get()
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: str = "internal",
+        trace_id: str = None,
+        parent_id: str = None,
+        **attributes,
+    ) -> Iterator[Optional[Span]]:
+        """
+        with tracer.span("crud.get", id=1) as span: ... - span is None when disabled
+        :param name: str
+        :param kind: str - internal | server | client
+        :param trace_id: str - continue remote trace (traceparent), else current one
+        :param parent_id: str - remote parent span id
+        :param attributes: span attributes
+        """
+        if self.processor is None:
+            yield None
+            return
+        parent = _current_span.get()
+        if trace_id is None and parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        span = Span(
+            name,
+            trace_id or secrets.token_hex(16),
+            parent_id,
+            kind=kind,
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as err:
+            span.error = f"{type(err).__name__}: {err}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            processor = self.processor
+            if processor is not None:
+                processor.on_end(span)
+
+    def record(self, name: str, start_ns: int, **attributes) -> None:
+        """
+        add span of operation which already finished (started at start_ns, ends now)
+        as child of current span, for code not wrapped into span()
+        :param name: str
+        :param start_ns: int - time.time_ns() at operation start
+        :param attributes: span attributes
+        """
+        processor = self.processor
+        if processor is None:
+            return
+        parent = _current_span.get()
+        span = Span(
+            name,
+            parent.trace_id if parent else secrets.token_hex(16),
+            parent.span_id if parent else None,
+            attributes=attributes,
+        )
+        span.start_ns = start_ns
+        span.end_ns = time.time_ns()
+        processor.on_end(span)
+
+    async def trace_chunks(
+        self, name: str, chunks: AsyncIterator, **attributes
+    ) -> AsyncIterator:
+        """
+        span covering consumption of async iterator (streamed template etc.)
+        :param name: str
+        :param chunks: async iterator
+        :return: async iterator with the same items
+        """
+        with self.span(name, **attributes):
+            async for chunk in chunks:
+                yield chunk
+
+
+tracer = Tracer()
+
+
+def traced(name: str = None, **attributes):
+    """
+    decorator running coroutine function inside span
+    :param name: str - span name, default is function qualname
+    :param attributes: span attributes
+    """
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(span_name, **attributes):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracingMiddleware:
+    """
+    Opens server span for every http request, continues trace from W3C traceparent
+    header and answers trace id in X-Trace-Id header
+    """
+
+    def __init__(self, app: ASGIApp, tracer: Tracer = tracer):
+        """
+        :param app: ASGI app
+        :param tracer: Tracer
+        """
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = parent_id = None
+        match = TRACEPARENT.match(Headers(scope=scope).get("traceparent", ""))
+        if match:
+            trace_id, parent_id = match.groups()
+
+        with self.tracer.span(
+            f"{scope['method']} {scope['path']}",
+            kind="server",
+            trace_id=trace_id,
+            parent_id=parent_id,
+            **{"http.method": scope["method"], "http.target": scope["path"]},
+        ) as span:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set(**{"http.status_code": message["status"]})
+                    MutableHeaders(scope=message)["X-Trace-Id"] = span.trace_id
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_template(scope)
+                span.name = f"{scope['method']} {route}"
+                # path params carry ids of disks etc.
+                span.set(**{"http.route": route}, **scope.get("path_params", {}))
@@ -0,0 +1,10 @@
+import hashlib
+
+
+def hash_token(token: str) -> str:
+    """
+    return fixed-size sha256 hex digest of access token, used as DB key instead of raw JWT
+    :param token: str
+    :return: str (64 chars)
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
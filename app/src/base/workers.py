@@ -0,0 +1,88 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.src.base import exceptions
+from app.src.base.metrics import registry
+
+pool_in_flight = registry.gauge(
+    "worker_pool_in_flight", "Calls running or queued in worker pool", ("pool",)
+)
+pool_queue_depth = registry.gauge(
+    "worker_pool_queue_depth", "Calls waiting for a free worker", ("pool",)
+)
+pool_rejected = registry.counter(
+    "worker_pool_rejected_total", "Calls rejected because queue was full", ("pool",)
+)
+
+
+class BoundedWorkerPool:
+    """
+    Thread pool for CPU heavy blocking calls (bcrypt etc.) with limited queue,
+    new work is rejected when queue is full instead of piling up behind the event loop
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        """
+        :param name: str - pool name, used in thread names and stats
+        :param max_workers: int - count of worker threads
+        :param max_queue: int - max count of calls waiting for a free worker
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=name
+        )
+        # counters are changed only from event loop thread
+        self.in_flight = 0
+        self.submitted = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self.in_flight - self.max_workers, 0)
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        run func in pool and wait for result
+        :param func: blocking callable
+        :return: func result
+        :raise: WorkerPoolBusy if queue is full
+        """
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            pool_rejected.inc(pool=self.name)
+            raise exceptions.WorkerPoolBusy(f"{self.name} pool queue is full")
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        self._change_in_flight(1)
+        self.submitted += 1
+        # slot is freed when job ends, not when awaiting request is cancelled
+        # while the job still runs in worker thread
+        future.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(self._change_in_flight, -1)
+        )
+        return await asyncio.wrap_future(future)
+
+    def _change_in_flight(self, delta: int) -> None:
+        self.in_flight += delta
+        pool_in_flight.set(self.in_flight, pool=self.name)
+        pool_queue_depth.set(self.queue_depth, pool=self.name)
+
+    def stats(self) -> dict:
+        """
+        return pool counters
+        :return: dict
+        """
+        return {
+            "workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
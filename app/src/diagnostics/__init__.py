@@ -0,0 +1,2 @@
+# here will be placed all imports of modules including classes and files
+from app.src.diagnostics import routes as diagnostics_router
@@ -0,0 +1,170 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+
+from app.src.auth.models import Token, User
+from app.src.auth.service import auth_service
+from app.src.base.memory import count_instances, memory_profiler
+from app.src.base.db.session import pool_stats
+from app.src.base.loop_monitor import loop_monitor
+from app.src.base.profiling import profile_store
+from app.src.disk_manager.models import Disk
+
+router = APIRouter(prefix="/diagnostics", tags=["diagnostics"])
+
+PROFILE_SORT_KEYS = "^(cumulative|tottime|ncalls|filename)$"
+
+
+@router.get("/profiles")
+async def list_profiles(token: str = Depends(auth_service.is_user_authed)):
+    """
+    List saved request profiles, newest first
+    :param token: str (gets from Depends)
+    :return: JSON with profiles info
+    """
+    return JSONResponse(content={"profiles": profile_store.list()})
+
+
+@router.get("/profiles/{name}")
+async def download_profile(
+        name: str, token: str = Depends(auth_service.is_user_authed)
+):
+    """
+    Download profile as pstats dump (python -m pstats <file>, snakeviz etc.)
+    :param name: str - profile name
+    :param token: str (gets from Depends)
+    :return: file
+    """
+    path = profile_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{name}' not found")
+    return FileResponse(
+        path, media_type="application/octet-stream", filename=f"{name}.prof"
+    )
+
+
+@router.get("/profiles/{name}/stats")
+async def profile_stats(
+        name: str,
+        sort: str = Query("cumulative", regex=PROFILE_SORT_KEYS),
+        limit: int = Query(50, ge=1, le=1000),
+        token: str = Depends(auth_service.is_user_authed),
+):
+    """
+    Show top functions of profile as text
+    :param name: str - profile name
+    :param sort: str - pstats sort key
+    :param limit: int - count of functions
+    :param token: str (gets from Depends)
+    :return: text/plain
+    """
+    stats = profile_store.stats(name, sort=sort, limit=limit)
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{name}' not found")
+    return PlainTextResponse(stats)
+
+
+@router.get("/loop-stalls")
+async def loop_stalls(token: str = Depends(auth_service.is_user_authed)):
+    """
+    Recent event loop stalls with stacks of blocking calls
+    :param token: str (gets from Depends)
+    :return: JSON
+    """
+    return JSONResponse(
+        content={"threshold": loop_monitor.threshold, "stalls": loop_monitor.recent()}
+    )
+
+
+@router.get("/pool")
+async def db_pool_stats(token: str = Depends(auth_service.is_user_authed)):
+    """
+    State of db connection pool and checkout totals
+    :param token: str (gets from Depends)
+    :return: JSON
+    """
+    return JSONResponse(content=pool_stats())
+
+
+@router.get("/memory")
+async def memory_status(token: str = Depends(auth_service.is_admin)):
+    """
+    tracemalloc state, kept snapshots and counts of live ORM objects
+    :param token: str (gets from Depends)
+    :return: JSON
+    """
+    return JSONResponse(
+        content={
+            "tracing": memory_profiler.tracing,
+            "snapshots": memory_profiler.list(),
+            # walks whole gc heap, off the event loop
+            "objects": await asyncio.to_thread(count_instances, (Disk, User, Token)),
+        }
+    )
+
+
+@router.post("/memory/start")
+async def memory_start(
+        frames: int = Query(1, ge=1, le=50),
+        token: str = Depends(auth_service.is_admin),
+):
+    """
+    Start tracing allocations
+    :param frames: int - stored traceback depth
+    :param token: str (gets from Depends)
+    :return: JSON
+    """
+    memory_profiler.start(frames)
+    return JSONResponse(content={"tracing": memory_profiler.tracing})
+
+
+@router.post("/memory/stop")
+async def memory_stop(token: str = Depends(auth_service.is_admin)):
+    """
+    Stop tracing allocations and drop snapshots
+    :param token: str (gets from Depends)
+    :return: JSON
+    """
+    memory_profiler.stop()
+    return JSONResponse(content={"tracing": memory_profiler.tracing})
+
+
+@router.post("/memory/snapshots")
+async def memory_snapshot(token: str = Depends(auth_service.is_admin)):
+    """
+    Take allocations snapshot
+    :param token: str (gets from Depends)
+    :return: JSON with snapshot id
+    """
+    try:
+        snapshot = await asyncio.to_thread(memory_profiler.snapshot)
+    except RuntimeError as err:
+        raise HTTPException(status_code=409, detail=str(err))
+    return JSONResponse(content=snapshot)
+
+
+@router.get("/memory/diff")
+async def memory_diff(
+        base: int = None,
+        target: int = None,
+        group_by: str = Query("lineno", regex="^(filename|lineno|traceback)$"),
+        top: int = Query(20, ge=1, le=500),
+        token: str = Depends(auth_service.is_admin),
+):
+    """
+    Top allocation growth between two snapshots, the oldest and the latest by default
+    :param base: int - snapshot id
+    :param target: int - snapshot id
+    :param group_by: str - filename | lineno | traceback
+    :param top: int
+    :param token: str (gets from Depends)
+    :return: JSON
+    """
+    try:
+        diff = await asyncio.to_thread(
+            memory_profiler.diff, base, target, group_by=group_by, top=top
+        )
+    except KeyError as err:
+        raise HTTPException(status_code=404, detail=f"Snapshot not found: {err}")
+    return JSONResponse(content={"diff": diff})
@@ -5,3 +5,5 @@ from app.src.disk_manager import crud as disk_manager_crud
 from app.src.disk_manager import schemas as disk_manager_schemas
 from app.src.disk_manager import init_db as disk_manager_init_db
 from app.src.disk_manager import service as disk_manager_service
+from app.src.disk_manager import events as disk_manager_events
+from app.src.disk_manager import tasks as disk_manager_tasks
@@ -1,10 +1,14 @@
-from sqlalchemy import select
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.src.base import CRUDBase
 from logger import logger
-from app.src.disk_manager.models import Disk
+from app.src.disk_manager.models import Disk, DiskChange, InventoryState
 from app.src.disk_manager.schemas import DiskCreate, DiskUpdate
+from app.src.disk_manager import schemas
 
 
 class CRUDDisk(CRUDBase[Disk, DiskCreate, DiskUpdate]):
@@ -15,7 +19,7 @@ class CRUDDisk(CRUDBase[Disk, DiskCreate, DiskUpdate]):
         :param name: str
         :return: models.Disk
         """
-        logger.log(f"Get disk by name: {name}")
+        logger.debug("Get disk by name: {name}", name=name)
         return (
             (await session.execute(select(self.model).where(self.model.name == name)))
             .scalars()
@@ -29,7 +33,7 @@ class CRUDDisk(CRUDBase[Disk, DiskCreate, DiskUpdate]):
         :param obj_in: schemas.DiskCreate
         :return: models.Disk
         """
-        logger.log(f"Create or skip disk: {obj_in}")
+        logger.debug("Create or skip disk: {disk}", disk=obj_in)
         if not obj_in.name:
             obj_in.name = obj_in.name
         obj = await self.get_by_name(session, name=obj_in.name)
@@ -37,5 +41,93 @@ class CRUDDisk(CRUDBase[Disk, DiskCreate, DiskUpdate]):
             return obj
         return await self.create(session, obj_in=obj_in)
 
+    async def get_inventory_stamp(self, session: AsyncSession) -> tuple:
+        """
+        Return inventory version bumped by every insert, update and delete of disks,
+        used for ETag and Last-Modified of disk listings
+        :param session: AsyncSession
+        :return: tuple (version, changed_at)
+        """
+        query = select(InventoryState.version, InventoryState.changed_at).where(
+            InventoryState.id == 1
+        )
+        stamp = (await session.execute(query)).one_or_none()
+        if stamp is None:
+            # without the row disks trigger can't number changes, restore it
+            # continuing after the newest logged change
+            logger.warning("Inventory state row is missing, recreating it")
+            await session.execute(
+                insert(InventoryState)
+                .values(
+                    id=1,
+                    version=select(
+                        func.coalesce(func.max(DiskChange.version), 0)
+                    ).scalar_subquery(),
+                    changed_at=datetime.utcnow(),
+                )
+                .on_conflict_do_nothing(index_elements=[InventoryState.id])
+            )
+            await self._commit(session)
+            stamp = (await session.execute(query)).one()
+        return tuple(stamp)
+
 
 crud_disk = CRUDDisk(Disk)
+
+
+class CRUDDiskChange(CRUDBase[DiskChange, schemas.DiskChange, schemas.DiskChange]):
+    async def get_since(
+        self, session: AsyncSession, since: int, limit: int
+    ) -> schemas.DiskChanges:
+        """
+        Return changes made after version `since`, or resync marker if they are
+        not in the log anymore
+        :param session: AsyncSession
+        :param since: int - last version known by client
+        :param limit: int - max count of returned changes
+        :return: schemas.DiskChanges
+        """
+        version, _ = await crud_disk.get_inventory_stamp(session)
+        oldest = (
+            await session.execute(select(func.min(self.model.version)))
+        ).scalar_one_or_none()
+        if since > version or since < (oldest or version + 1) - 1:
+            return schemas.DiskChanges(version=version, resync=True)
+
+        changes = (
+            (
+                await session.execute(
+                    select(self.model)
+                    .where(self.model.version > since)
+                    .order_by(self.model.version)
+                    .limit(limit)
+                )
+            )
+            .scalars()
+            .all()
+        )
+        has_more = len(changes) == limit
+        if changes and (has_more or changes[-1].version > version):
+            version = changes[-1].version
+        return schemas.DiskChanges(
+            version=version,
+            has_more=has_more,
+            changes=[schemas.DiskChange.from_orm(change) for change in changes],
+        )
+
+    async def trim(self, session: AsyncSession, keep: int) -> int:
+        """
+        Delete changes older than `keep` last versions
+        :param session: AsyncSession
+        :param keep: int
+        :return: int - count of deleted rows
+        """
+        version, _ = await crud_disk.get_inventory_stamp(session)
+        result = await session.execute(
+            delete(self.model).where(self.model.version <= version - keep)
+        )
+        await self._commit(session)
+        return result.rowcount
+
+
+crud_disk_change = CRUDDiskChange(DiskChange)
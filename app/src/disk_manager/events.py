@@ -0,0 +1,45 @@
+from app.src.base import settings
+from app.src.base.events import EventBroker
+from app.src.disk_manager.models import Disk
+
+disk_events = EventBroker(
+    history_size=settings.DISK_EVENTS_HISTORY_SIZE,
+    queue_size=settings.DISK_EVENTS_QUEUE_SIZE,
+)
+
+
+def publish_disk(event: str, disk: Disk) -> int:
+    """
+    publish compact disk state: "added", "updated", "mounted", "formatted", "wiped"
+    :param event: str
+    :param disk: models.Disk
+    :return: int - event id
+    """
+    return disk_events.publish(
+        event,
+        {
+            "id": disk.id,
+            "name": disk.name,
+            "size": disk.size,
+            "mountpoint": disk.mountpoint,
+        },
+    )
+
+
+def publish_removed(disk_id: int) -> int:
+    return disk_events.publish("removed", {"id": disk_id})
+
+
+def publish_job(disk_id: int, action: str, state: str, error: str = None) -> int:
+    """
+    publish progress of long shell command run for disk
+    :param disk_id: int
+    :param action: str - "format", "mount", "unmount", "wipefs"
+    :param state: str - "started", "finished" or "failed"
+    :param error: str
+    :return: int - event id
+    """
+    data = {"id": disk_id, "action": action, "state": state}
+    if error:
+        data["error"] = error
+    return disk_events.publish("job", data)
@@ -1,4 +1,3 @@
-import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from logger import logger
@@ -14,22 +13,17 @@ async def init(session: AsyncSession) -> None:
     :param session: AsyncSession
     :return: None (results will be filled in DB)
     """
-    logger.log("Init disks in db")
+    logger.info("Init disks in db")
     disks = await disk_service.get_disks()
-    logger.log(f"Disks got")
+    logger.debug("Disks got")
     for disk in disks:
         try:
             db_disk = await crud_disk.get_by_name(session=session, name=disk["name"])
             if not db_disk:
                 await crud_disk.create(db=session, obj_in=DiskCreate(**disk))
         except Exception as e:
-            with open(
-                f"./logs/{datetime.datetime.now().date().strftime('%Y-%m-%d')}.log", "a"
-            ) as f:
-                f.write(
-                    f"{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {e}\n"
-                )
-    logger.log(f"Disks inited")
+            logger.error("Init disk {name} failed: {error}", name=disk["name"], error=e)
+    logger.info("Disks inited")
 
 
 async def init_disks_in_db():
@@ -38,10 +32,10 @@ async def init_disks_in_db():
     :return: None
     """
     session = await get_session_()
-    logger.log(f"{datetime.datetime.now()} - open connection and fill disks in db")
+    logger.debug("open connection and fill disks in db")
     try:
         await init(session)
-        logger.log(f"{datetime.datetime.now()} - filling disks to the DB was successful")
+        logger.info("filling disks to the DB was successful")
     finally:
         await session.close()
-        logger.log(f"{datetime.datetime.now()} - close connection was successful")
+        logger.debug("close connection was successful")
@@ -1,6 +1,7 @@
 from datetime import datetime
 
 from sqlalchemy import Column, Integer, String, DateTime, BIGINT
+from sqlalchemy.dialects.postgresql import JSONB
 from app.src.base import Base
 
 
@@ -12,3 +13,28 @@ class Disk(Base):
     filesystem = Column(String)
     mountpoint = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class InventoryState(Base):
+    """
+    single row, version is bumped by disks trigger on every insert, update and delete
+    """
+
+    __tablename__ = "inventory_state"
+    id = Column(Integer, primary_key=True)
+    version = Column(BIGINT, nullable=False, default=0)
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DiskChange(Base):
+    """
+    bounded log of disk changes written by disks trigger, one row per inventory version
+    """
+
+    __tablename__ = "disk_changes"
+    version = Column(BIGINT, primary_key=True, autoincrement=False)
+    disk_id = Column(Integer, nullable=False)
+    op = Column(String(6), nullable=False)  # insert | update | delete
+    data = Column(JSONB)  # disk row after change, null for delete
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,25 +1,48 @@
+import asyncio
 import platform
 import string
-from datetime import datetime
+from typing import Optional
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Query, Request
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from fastapi.encoders import jsonable_encoder
 
-from app.src.base.exceptions import CommandRun
+from app.src.base.exceptions import CommandRun, DatabaseUnavailable
 from logger import logger
 from app.src.auth.service import auth_service
-from app.src.disk_manager.service import disk_service
-from app.src.base import get_session
-from app.src.disk_manager.crud import crud_disk
+from app.src.disk_manager.service import disk_service, inventory_cache
+from app.src.base import get_session, settings
+from app.src.base.conditional import (
+    is_not_modified,
+    make_etag,
+    not_modified,
+    set_validators,
+)
+from app.src.base.db.session import get_session_
+from app.src.base.db.routing import share_read_bind
+from app.src.base.db.unit_of_work import UnitOfWorkRoute, after_commit
+from app.src.base.templating import templates
+from app.src.base.utils import hash_token
+from app.src.disk_manager.crud import crud_disk, crud_disk_change
+from app.src.disk_manager.events import (
+    disk_events,
+    publish_disk,
+    publish_job,
+    publish_removed,
+)
 from app.src.disk_manager.models import Disk
 from app.src.disk_manager.schemas import DiskCreate, DiskUpdate
+from app.src.disk_manager import schemas
+from app.src.rate_limit.service import disk_mutation_rate_limits
 
-router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
 async def get_access_token_from_cookies(request: Request):
@@ -31,6 +54,63 @@ async def get_access_token_from_cookies(request: Request):
     return request.cookies.get("access_token")
 
 
+async def iter_disks(version: int = None, source: AsyncSession = None):
+    """
+    Yield disks from DB cursor, own session lives until the streamed page is rendered.
+    Inventory of new version is also kept in inventory_cache
+    :param version: int - inventory version being streamed
+    :param source: AsyncSession version was read by, disks are read from the same
+        replica or primary, so they are not older than version
+    :return: async iterator of models.Disk
+    """
+    cached = [] if version is None or version != inventory_cache.version else None
+    session = await get_session_()
+    if source is not None:
+        share_read_bind(source, session)
+    try:
+        async for disk in crud_disk.stream_all(
+            session, batch_size=settings.DISKS_STREAM_BATCH_SIZE
+        ):
+            if cached is not None:
+                cached.append(schemas.Disk.from_orm(disk))
+            yield disk
+    finally:
+        await session.close()
+    if cached is not None:
+        inventory_cache.update(cached, version)
+
+
+def cached_disks_response(
+    request: Request, token: str, as_json: bool, error: DatabaseUnavailable
+):
+    """
+    Last known disks while DB is unavailable, marked by X-Inventory-Stale header
+    with time the list was read
+    :param request: fastapi.Request
+    :param token: str
+    :param as_json: bool
+    :param error: DatabaseUnavailable - raised again if nothing is cached yet
+    :return: JSON or streamed template
+    """
+    if inventory_cache.disks is None:
+        raise error
+    logger.warning("Database is unavailable, answering cached disks")
+    headers = {
+        "X-Inventory-Stale": inventory_cache.updated_at.isoformat(),
+        "Cache-Control": "no-store",
+    }
+    if as_json:
+        return JSONResponse(
+            content=jsonable_encoder(inventory_cache.disks), headers=headers
+        )
+    context = {"request": request, "access_token": token, "disks": inventory_cache.disks}
+    return templates.StreamingTemplateResponse("disks.html", context, headers=headers)
+
+
+def wants_json(request: Request) -> bool:
+    return "application/json" in request.headers.get("accept", "")
+
+
 @router.get("/disks", response_class=HTMLResponse)
 async def get_disks_view(
         request: Request,
@@ -38,17 +118,55 @@ async def get_disks_view(
         session: AsyncSession = Depends(get_session),
 ):
     """
-    Return filled with computer and added disks HTML response.
+    Return filled with computer and added disks HTML response, or JSON list of disks
+    if client accepts application/json.
+    Page is streamed: header is sent at once, rows are rendered while they are read from DB.
+    Unchanged inventory is answered with 304 without rendering.
+    While DB is unavailable last known disks are answered
     :param request: fastapi.Request
     :param token: str
     :param session: AsyncSession
-    :return: template filled with disks
+    :return: streamed template filled with disks, JSON or 304
     """
-    logger.log(f"{datetime.now()} - Get disks view")
-    disks = await crud_disk.get_all(db=session)
-    context = {"request": request, "access_token": token, "disks": disks}
-    logger.log(f"{datetime.now()} - Context: {context}")
-    return templates.TemplateResponse("disks.html", context)
+    logger.debug("Get disks view")
+    as_json = wants_json(request)
+    try:
+        # session keeps reading from one replica (or primary), so list read
+        # below is never older than this version
+        version, last_modified = await crud_disk.get_inventory_stamp(session)
+    except DatabaseUnavailable as err:
+        return cached_disks_response(request, token, as_json, err)
+    etag = make_etag(
+        "disks",
+        "json" if as_json else templates.version,
+        hash_token(token),  # page embeds the token
+        version,
+    )
+    vary = "Accept, Cookie, Authorization"
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified, vary)
+
+    if as_json:
+        try:
+            disks = await crud_disk.get_all(db=session)
+        except DatabaseUnavailable as err:
+            return cached_disks_response(request, token, as_json, err)
+        disks = [schemas.Disk.from_orm(disk) for disk in disks]
+        inventory_cache.update(disks, version)
+        response = JSONResponse(
+            content=jsonable_encoder(disks),
+            # list is at least this version, continue with /disks/changes?since=<it>
+            headers={"X-Inventory-Version": str(version)},
+        )
+    else:
+        context = {
+            "request": request,
+            "access_token": token,
+            "disks": iter_disks(version, session),
+        }
+        logger.debug("Context: {context}", context=context)
+        response = templates.StreamingTemplateResponse("disks.html", context)
+    return set_validators(response, etag, last_modified, vary)
 
 
 @router.post("/disks/new")
@@ -66,7 +184,7 @@ async def create_disk(
     :param token: str (gets from Depend)
     :return: JSON with new disk or error message
     """
-    logger.log(f"{datetime.now()} - Create disk: {disk.dict()}")
+    logger.debug("Create disk: {disk}", disk=disk)
     db_disk = await crud_disk.get_by_name(session=session, name=disk.name)
 
     if db_disk:
@@ -77,12 +195,72 @@ async def create_disk(
         )
 
     new_disk: Disk = await crud_disk.create(db=session, obj_in=disk)
-    logger.log(f"{datetime.now()} - New disk: {new_disk.__dict__}")
+    logger.info(
+        "New disk: {disk_id} {name} {size}",
+        disk_id=new_disk.id,
+        name=new_disk.name,
+        size=new_disk.size,
+    )
+    after_commit(session, publish_disk, "added", new_disk)
 
     # return successful status with response
     return JSONResponse(content=jsonable_encoder(new_disk), status_code=201)
 
 
+@router.get("/disks/changes", response_model=schemas.DiskChanges)
+async def get_disk_changes(
+        since: int = Query(ge=0),
+        limit: int = Query(default=settings.DISK_CHANGES_PAGE_SIZE, ge=1, le=10000),
+        session: AsyncSession = Depends(get_session),
+        token: str = Depends(auth_service.is_user_authed),
+):
+    """
+    Return disk inserts, updates and deletes made after inventory version `since`.
+    If `since` is out of change log, `resync` is true and full list must be fetched
+    from GET /disks (Accept: application/json), its X-Inventory-Version is next `since`
+    :param since: int - last inventory version known by client
+    :param limit: int - max count of changes, `has_more` tells to request again
+    :param session: AsyncSession
+    :param token: str
+    :return: schemas.DiskChanges
+    """
+    logger.debug("Get disk changes since {since}", since=since)
+    return await crud_disk_change.get_since(session, since=since, limit=limit)
+
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    """
+    :param value: str - Last-Event-ID header sent by reconnecting EventSource
+    :return: int or None if header is missing or malformed
+    """
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+@router.get("/disks/events")
+async def disk_events_stream(
+        request: Request,
+        token: str = Depends(auth_service.is_user_authed),
+):
+    """
+    Server-Sent Events feed of disk changes: added, updated, removed, mounted,
+    formatted, wiped and job (progress of shell commands), all open pages share it
+    :param request: fastapi.Request
+    :param token: str
+    :return: text/event-stream
+    """
+    return StreamingResponse(
+        disk_events.stream(
+            last_event_id=parse_event_id(request.headers.get("last-event-id")),
+            heartbeat=settings.DISK_EVENTS_HEARTBEAT_SECONDS,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/disks/{disk_id}", response_class=HTMLResponse)
 async def get_disk_view(
         request: Request,
@@ -98,13 +276,19 @@ async def get_disk_view(
     :param token: str
     :return: template filled with disk or error message
     """
-    logger.log(f"{datetime.now()} - Get disk view with id '{disk_id}'")
+    logger.debug("Get disk view with id '{disk_id}'", disk_id=disk_id)
     db_disk = await crud_disk.get(session, disk_id)
     if not db_disk:
         context = {"request": request, "error": f"Disk with id '{disk_id}' not found"}
         return templates.TemplateResponse("error.html", context)
+    etag = make_etag(
+        "disk", templates.version, hash_token(token), db_disk.id, db_disk.updated_at
+    )
+    if is_not_modified(request, etag, db_disk.updated_at):
+        return not_modified(etag, db_disk.updated_at)
     context = {"request": request, "disk": db_disk, "access_token": token}
-    return templates.TemplateResponse("disk.html", context)
+    response = templates.TemplateResponse("disk.html", context)
+    return set_validators(response, etag, db_disk.updated_at)
 
 
 @router.post("/disks/{disk_id}/update")
@@ -124,21 +308,73 @@ async def update_disk(
     :param token: str
     :return: JSON with updated disk or error message
     """
-    logger.log(f"{datetime.now()} - Update disk with id '{disk_id}'")
+    logger.debug("Update disk with id '{disk_id}'", disk_id=disk_id)
     db_disk = await crud_disk.get(session, disk_id)
     if not db_disk:
         context = {"request": request, "error": f"Disk with id '{disk_id}' not found"}
         return templates.TemplateResponse("error.html", context)
-    print(f"updated disk: {update_disk}")
     updated_disk = await crud_disk.update(session, db_obj=db_disk, obj_in=disk)
-    logger.log(f"{datetime.now()} - Updated disk: {updated_disk.__dict__}")
+    logger.info(
+        "Updated disk: {disk_id} {name} {size}",
+        disk_id=updated_disk.id,
+        name=updated_disk.name,
+        size=updated_disk.size,
+    )
+    after_commit(session, publish_disk, "updated", updated_disk)
     return
 
 
-@router.post("/disks/{disk_id}/format")
+async def disk_action_response(
+        alert: str,
+        token: str,
+        disk: Disk = None,
+        include_disks: bool = False,
+        status_code: int = 200,
+) -> JSONResponse:
+    """
+    Build JSON answer of disk action: message, affected disk state and, only if asked,
+    full disks list (it costs a system scan, so error answers never include it)
+    :param alert: str - message for user
+    :param token: str
+    :param disk: models.Disk - affected disk, None if it was removed or not found
+    :param include_disks: bool
+    :param status_code: int
+    :return: JSONResponse
+    """
+    content = {"alert": alert, "access_token": token}
+    content["disk"] = jsonable_encoder(schemas.Disk.from_orm(disk)) if disk else None
+    if include_disks:
+        content["disks"] = await disk_service.get_disks()
+    return JSONResponse(content=content, status_code=status_code)
+
+
+async def refresh_filesystem(session: AsyncSession, db_disk: Disk) -> Disk:
+    """
+    Write filesystem disk has after format or wipefs, so answer, event and
+    inventory version show it
+    :param session: AsyncSession
+    :param db_disk: models.Disk
+    :return: models.Disk
+    """
+    try:
+        filesystem = await asyncio.to_thread(disk_service.get_filesystem, db_disk.name)
+    except CommandRun as err:
+        logger.warning(
+            "Can't read filesystem of disk {disk_id}: {error}", disk_id=db_disk.id, error=err
+        )
+        return db_disk
+    return await crud_disk.update(
+        session, db_obj=db_disk, obj_in={"filesystem": filesystem or None}
+    )
+
+
+@router.post(
+    "/disks/{disk_id}/format", dependencies=disk_mutation_rate_limits
+)
 async def format_disk(
         request: Request,
         disk_id: int,
+        include_disks: bool = False,
         session: AsyncSession = Depends(get_session),
         token=Depends(auth_service.is_user_authed),
 ):
@@ -146,21 +382,18 @@ async def format_disk(
     Format disk and return JSON with success or error message
     :param request: fastapi.Request
     :param disk_id: int
+    :param include_disks: bool - add full disks list to successful answer
     :param session: AsyncSession
     :param token: str (Gets from Depends)
     :return: JSON
     """
-    logger.log(f"{datetime.now()} - Format disk with id '{disk_id}'")
+    logger.info("Format disk with id '{disk_id}'", disk_id=disk_id)
 
     db_disk: Disk = await crud_disk.get(session, disk_id)
     if not db_disk:
-        context = {
-            "request": request,
-            "alert": f"Disk with id '{disk_id}' not found",
-            "access_token": token,
-            "disks": await disk_service.get_disks(),
-        }
-        return JSONResponse(content=context, status_code=400)
+        return await disk_action_response(
+            f"Disk with id '{disk_id}' not found", token, status_code=400
+        )
 
     # Windows disk formatting command
     if platform.system() == "Windows":
@@ -168,29 +401,33 @@ async def format_disk(
     else:
         format_cmd = ["sudo", "mkfs.ext4", "-F", f"/dev/{db_disk.name}"]
 
+    publish_job(disk_id, "format", "started")
     try:
-        disk_service.run_shell_command(format_cmd)
+        await asyncio.to_thread(disk_service.run_shell_command, format_cmd)
     except CommandRun as err:
-        context = {
-            "access_token": token,
-            "disks": await disk_service.get_disks(),
-            "alert": f"Disk with id '{disk_id}' not formatted, err: {err}",
-        }
-        return JSONResponse(content=context, status_code=400)
-
-    context = {
-        "alert": f"disk {disk_id} was formatted",
-        "access_token": token,
-        "disks": await disk_service.get_disks(),
-    }
+        publish_job(disk_id, "format", "failed", str(err))
+        return await disk_action_response(
+            f"Disk with id '{disk_id}' not formatted, err: {err}",
+            token,
+            disk=db_disk,
+            status_code=400,
+        )
 
-    return JSONResponse(content=context, status_code=200)
+    publish_job(disk_id, "format", "finished")
+    db_disk = await refresh_filesystem(session, db_disk)
+    after_commit(session, publish_disk, "formatted", db_disk)
+    return await disk_action_response(
+        f"disk {disk_id} was formatted", token, disk=db_disk, include_disks=include_disks
+    )
 
 
-@router.post("/disks/{disk_id}/mount")
+@router.post(
+    "/disks/{disk_id}/mount", dependencies=disk_mutation_rate_limits
+)
 async def mount_disk(
         request: Request,
         disk_id: int,
+        include_disks: bool = False,
         session: AsyncSession = Depends(get_session),
         token=Depends(auth_service.is_user_authed),
 ):
@@ -198,23 +435,18 @@ async def mount_disk(
     Mount disk and return JSON with success or error message
     :param request: fastapi.Request
     :param disk_id: int
+    :param include_disks: bool - add full disks list to successful answer
     :param session: AsyncSession (gets from Depends)
     :param token: str (gets from Depends)
     :return: JSON with success or error message
     """
-    logger.log(f"{datetime.now()} - Mount disk with id '{disk_id}'")
+    logger.info("Mount disk with id '{disk_id}'", disk_id=disk_id)
 
     db_disk: Disk = await crud_disk.get(session, disk_id)
 
     if not db_disk:
-        context = {"request": request, "error": f"Disk with id '{disk_id}' not found"}
-        return JSONResponse(
-            content={
-                "alert": f"Disk with id '{disk_id}' not found",
-                "disks": await disk_service.get_disks(),
-                "access_token": token,
-            },
-            status_code=400,
+        return await disk_action_response(
+            f"Disk with id '{disk_id}' not found", token, status_code=400
         )
 
     # Mount disk
@@ -223,39 +455,37 @@ async def mount_disk(
     else:
         mount_cmd = ["sudo", "mount", f"/dev/{db_disk.name}", db_disk.mountpoint]
 
+    publish_job(disk_id, "mount", "started")
     try:
-        disk_service.run_shell_command(mount_cmd)
+        await asyncio.to_thread(disk_service.run_shell_command, mount_cmd)
     except CommandRun as err:
-        context = {
-            "request": request,
-            "error": f"Disk with id '{disk_id}' not mounted, err: {err}",
-        }
-        return JSONResponse(
-            content={
-                "alert": f"disk {disk_id} was not mounted.\n{err}",
-                "disks": await disk_service.get_disks(),
-                "access_token": token,
-            },
+        publish_job(disk_id, "mount", "failed", str(err))
+        return await disk_action_response(
+            f"disk {disk_id} was not mounted.\n{err}",
+            token,
+            disk=db_disk,
             status_code=400,
         )
 
-    logger.log(
-        f"{datetime.now()} - disk {disk_id} was successfully mounted"
-    )
+    logger.info("disk {disk_id} was successfully mounted", disk_id=disk_id)
+    publish_job(disk_id, "mount", "finished")
+    after_commit(session, publish_disk, "mounted", db_disk)
 
-    return JSONResponse(
-        content={
-            "alert": f"disk {disk_id} was successfully mounted",
-            "disks": await disk_service.get_disks(),
-            "access_token": token,
-        }
+    return await disk_action_response(
+        f"disk {disk_id} was successfully mounted",
+        token,
+        disk=db_disk,
+        include_disks=include_disks,
     )
 
 
-@router.post("/disks/{disk_id}/unmount")
+@router.post(
+    "/disks/{disk_id}/unmount", dependencies=disk_mutation_rate_limits
+)
 async def umount_disk(
         request: Request,
         disk_id: int,
+        include_disks: bool = False,
         session: AsyncSession = Depends(get_session),
         token=Depends(auth_service.is_user_authed),
 ):
@@ -263,20 +493,16 @@ async def umount_disk(
     Unmount disk by id and return JSON
     :param request: fastapi.Request
     :param disk_id: int
+    :param include_disks: bool - add full disks list to successful answer
     :param session: AsyncSession (gets from Depends)
     :param token: str (gets from Depends)
     :return: JSON with success or error message
     """
-    logger.log(f"{datetime.now()} - Umount disk with id '{disk_id}'")
+    logger.info("Umount disk with id '{disk_id}'", disk_id=disk_id)
     db_disk = await crud_disk.get(session, disk_id)
     if not db_disk:
-        return JSONResponse(
-            content={
-                "alert": f"Disk with id '{disk_id}' not found",
-                "disks": await disk_service.get_disks(),
-                "access_token": token,
-            },
-            status_code=400,
+        return await disk_action_response(
+            f"Disk with id '{disk_id}' not found", token, status_code=400
         )
 
     if platform.system() == "Windows":
@@ -285,13 +511,12 @@ async def umount_disk(
 
         # Check if the drive letter is valid
         if drive_letter.upper() not in string.ascii_uppercase:
-            context = {
-                "request": request,
-                "alert": f"Invalid drive letter for mountpoint {db_disk.mountpoint}",
-                "disks": await disk_service.get_disks(),
-                "access_token": token,
-            }
-            return JSONResponse(content=context, status_code=400)
+            return await disk_action_response(
+                f"Invalid drive letter for mountpoint {db_disk.mountpoint}",
+                token,
+                disk=db_disk,
+                status_code=400,
+            )
 
         # Unmount the disk in Win
         cmd = ["mountvol", drive_letter + ":", "/p"]
@@ -299,35 +524,37 @@ async def umount_disk(
         # Unmount the disk in Linux
         cmd = ["sudo", "umount", "-fl", f"/dev/{db_disk.name}"]
 
+    publish_job(disk_id, "unmount", "started")
     try:
-        disk_service.run_shell_command(cmd)
+        await asyncio.to_thread(disk_service.run_shell_command, cmd)
     except CommandRun as err:
-        return JSONResponse(
-            content={
-                "alert": f"Disk with id '{disk_id}' not unmounted,\n{err}",
-                "disks": await disk_service.get_disks(),
-                "access_token": token,
-            },
+        publish_job(disk_id, "unmount", "failed", str(err))
+        return await disk_action_response(
+            f"Disk with id '{disk_id}' not unmounted,\n{err}",
+            token,
+            disk=db_disk,
             status_code=400,
         )
-    logger.log(f"{datetime.now()} - delete disk, disk.id={disk_id}")
+    logger.debug("delete disk, disk.id={disk_id}", disk_id=disk_id)
     await crud_disk.remove(db=session, id=db_disk.id)
-    logger.log(f"{datetime.now()} - disk unmounted")
-
-    return JSONResponse(
-        content={
-            "alert": f"Disk with id '{disk_id}' successfully unmounted",
-            "disks": await disk_service.get_disks(),
-            "access_token": token,
-        },
-        status_code=200,
+    logger.info("disk {disk_id} unmounted", disk_id=disk_id)
+    publish_job(disk_id, "unmount", "finished")
+    after_commit(session, publish_removed, disk_id)
+
+    return await disk_action_response(
+        f"Disk with id '{disk_id}' successfully unmounted",
+        token,
+        include_disks=include_disks,
     )
 
 
-@router.post("/disks/{disk_id}/wipefs")
+@router.post(
+    "/disks/{disk_id}/wipefs", dependencies=disk_mutation_rate_limits
+)
 async def wipefs_disk(
         request: Request,
         disk_id: int,
+        include_disks: bool = False,
         session: AsyncSession = Depends(get_session),
         token: str = Depends(auth_service.is_user_authed),
 ):
@@ -335,6 +562,7 @@ async def wipefs_disk(
     Run wipefs command for selected disk and return JSON
     :param request: fastapi.Request
     :param disk_id: int
+    :param include_disks: bool - add full disks list to successful answer
     :param session: AsyncSession
     :param token: str (Get from Depends)
     :return: JSON with success or error message
@@ -342,34 +570,30 @@ async def wipefs_disk(
 
     db_disk = await crud_disk.get(session, disk_id)
     if not db_disk:
-        return JSONResponse(
-            content={
-                "alert": f"Disk with id '{disk_id}' not found",
-                "disks": await disk_service.get_disks(),
-                "access_token": token,
-            },
-            status_code=400,
+        return await disk_action_response(
+            f"Disk with id '{disk_id}' not found", token, status_code=400
         )
 
     # Wipe disk headers in Linux (IDK how to it in Win)
     cmd = ["sudo", "wipefs", "-a", f"/dev/{db_disk.name}"]
 
+    publish_job(disk_id, "wipefs", "started")
     try:
-        disk_service.run_shell_command(cmd)
+        await asyncio.to_thread(disk_service.run_shell_command, cmd)
     except CommandRun as err:
-        return JSONResponse(
-            content={
-                "alert": f"Disk with id '{disk_id}' not wiped,\n{err}",
-                "disks": await disk_service.get_disks(),
-                "access_token": token,
-            },
+        publish_job(disk_id, "wipefs", "failed", str(err))
+        return await disk_action_response(
+            f"Disk with id '{disk_id}' not wiped,\n{err}",
+            token,
+            disk=db_disk,
             status_code=400,
         )
-    return JSONResponse(
-        content={
-            "alert": f"Disk with id '{disk_id}' was wiped",
-            "disks": await disk_service.get_disks(),
-            "access_token": token,
-        },
-        status_code=200,
+    publish_job(disk_id, "wipefs", "finished")
+    db_disk = await refresh_filesystem(session, db_disk)
+    after_commit(session, publish_disk, "wiped", db_disk)
+    return await disk_action_response(
+        f"Disk with id '{disk_id}' was wiped",
+        token,
+        disk=db_disk,
+        include_disks=include_disks,
     )
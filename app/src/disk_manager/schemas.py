@@ -1,4 +1,5 @@
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel
 
 
@@ -19,6 +20,7 @@ class DiskUpdate(DiskBase):
 
 class Disk(DiskBase):
     id: int
+    updated_at: Optional[datetime] = None  # part of disk row fragment cache key
 
     class Config:
         orm_mode = True
@@ -26,3 +28,20 @@ class Disk(DiskBase):
 
 class CommandOutput(BaseModel):
     output: str
+
+
+class DiskChange(BaseModel):
+    version: int
+    disk_id: int
+    op: str
+    data: Optional[dict] = None
+
+    class Config:
+        orm_mode = True
+
+
+class DiskChanges(BaseModel):
+    version: int  # pass it as `since` in next request
+    resync: bool = False  # `since` is out of change log, fetch full list instead
+    has_more: bool = False
+    changes: List[DiskChange] = []
@@ -1,12 +1,15 @@
-import datetime
 import platform
 import subprocess
 import json
-from typing import Union, List
+import time
+from datetime import datetime
+from typing import Optional, Union, List
 
 
 from app.src.base import settings
 from app.src.base.exceptions import CommandRun
+from app.src.base.metrics import shell_command_duration
+from app.src.base.tracing import tracer
 from logger import logger
 
 
@@ -24,11 +27,12 @@ class DiskService:
         """
       
         sudo_password = settings.SUDO_PASSWORD
-        logger.log(f"{datetime.datetime.now()} - command: {command}")
+        logger.debug("command: {command}", command=command)
 
         if type(command) is str:
             command: List[str] = command.split(" ")
 
+        started_ns = time.time_ns()
         if platform.system() == "Linux":
             # run command with sudo will be work normally even in .env will be placed right password
             if "sudo" in command:
@@ -58,25 +62,43 @@ class DiskService:
                 text=True,
             )
 
-        logger.log(
-            f"{datetime.datetime.now()} - {command} returncode: {process.returncode}"
+        logger.debug(
+            "{command} returncode: {returncode}",
+            command=command,
+            returncode=process.returncode,
         )
 
         stdout, stderr = process.communicate()
+        # verb without sudo and arguments keeps label cardinality low
+        verb = next((part for part in command if part != "sudo"), "").split("/")[-1]
+        shell_command_duration.observe(
+            (time.time_ns() - started_ns) / 1e9,
+            command=verb,
+            exit_code=process.returncode,
+        )
+        tracer.record(
+            f"shell.{verb}",
+            started_ns,
+            command=verb,
+            device=next((part for part in command if part.startswith("/dev/")), None),
+            exit_code=process.returncode,
+        )
 
         if process.returncode == 0 or process.returncode == 64:
             return stdout
 
         if stderr != "":
-            logger.log(
-                f"Error {stderr} while running command with params command={command}"
+            logger.error(
+                "Error {stderr} while running command with params command={command}",
+                stderr=stderr,
+                command=command,
             )
             raise CommandRun(
                 f"Error while running command: {stderr} with params command={command}"
             )
 
         if not stdout.strip():
-            logger.log(f"Empty output while running command={command}")
+            logger.debug("Empty output while running command={command}", command=command)
             return "OK"
 
         return stdout.strip()
@@ -145,23 +167,61 @@ class DiskService:
                 )
         return disks
 
+    @staticmethod
+    def get_filesystem(name: str) -> str:
+        """
+        read current filesystem of one disk, ex: after format or wipefs
+        :param name: str - disk name, ex: `sdb` or `C:`
+        :return: str - filesystem, empty if disk has none
+        """
+        if platform.system() == "Windows":
+            disks = disk_service.get_win_disks()
+            return next(
+                (disk["filesystem"] for disk in disks if disk["name"] == name), ""
+            )
+        output = disk_service.run_shell_command(["lsblk", "-dno", "FSTYPE", f"/dev/{name}"])
+        return output.strip()
+
     @staticmethod
     async def get_disks() -> List[dict]:
         """
         analyze system, get disks and return their
         :return: List[dict]
         """
-        logger.log(f"{datetime.datetime.now()} - Get disks")
+        logger.debug("Get disks")
         disks = []
         if platform.system() == "Windows":
             disks = disk_service.get_win_disks()
         elif platform.system() == "Linux":
             disks = disk_service.get_linux_disks()
         else:
-            logger.log(f"{datetime.datetime.now()} - Unknown OS")
-        logger.log(f"{datetime.datetime.now()} - Disks: {disks}")
+            logger.warning("Unknown OS")
+        logger.debug("Disks: {disks}", disks=disks)
 
         return disks
 
 
 disk_service = DiskService()
+
+
+class InventoryCache:
+    """
+    Last disk list read from DB, served by /disks while DB is unavailable
+    """
+
+    def __init__(self):
+        self.disks: Optional[list] = None
+        self.version: Optional[int] = None
+        self.updated_at: Optional[datetime] = None
+
+    def update(self, disks: list, version: Optional[int] = None) -> None:
+        """
+        :param disks: list of schemas.Disk
+        :param version: int - inventory version of the list
+        """
+        self.disks = disks
+        self.version = version
+        self.updated_at = datetime.utcnow()
+
+
+inventory_cache = InventoryCache()
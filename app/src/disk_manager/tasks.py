@@ -0,0 +1,36 @@
+import asyncio
+
+from logger import logger
+from app.src.base import settings
+from app.src.base.db.session import get_session_
+from app.src.disk_manager.crud import crud_disk_change
+
+
+async def trim_change_log() -> int:
+    """
+    open own session and delete changes older than DISK_CHANGES_RETENTION versions
+    :return: int - count of deleted changes
+    """
+    session = await get_session_()
+    try:
+        return await crud_disk_change.trim(session, keep=settings.DISK_CHANGES_RETENTION)
+    finally:
+        await session.close()
+
+
+async def change_log_trim_loop() -> None:
+    """
+    background job, trim disk change log every DISK_CHANGES_TRIM_INTERVAL_SECONDS
+    so its size stays bounded by retention instead of total churn
+    :return: None (runs until cancelled)
+    """
+    logger.info("change log trim job started")
+    while True:
+        try:
+            deleted = await trim_change_log()
+            logger.debug("trimmed {count} disk changes", count=deleted)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("change log trim job failed: {error}", error=e)
+        await asyncio.sleep(settings.DISK_CHANGES_TRIM_INTERVAL_SECONDS)
@@ -0,0 +1,3 @@
+import app.src.rate_limit.models as rate_limit_models
+import app.src.rate_limit.schemas as rate_limit_schemas
+import app.src.rate_limit.service as rate_limit_service
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from sqlalchemy import Column, String, Float, Boolean, DateTime
+from app.src.base import Base
+
+
+class RateLimitBucket(Base):
+    """
+    token bucket state for shared (postgres) rate limit backend
+    """
+
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float)
+    allowed = Column(Boolean)  # decision of the last hit
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+
+
+class RateLimitPolicy(BaseModel):
+    """
+    token bucket params: bucket holds up to `capacity` tokens and refills by `rate` tokens per second
+    """
+
+    name: str
+    rate: float
+    capacity: float
+
+    @classmethod
+    def per_minute(cls, name: str, count: int) -> "RateLimitPolicy":
+        """
+        policy allowing burst of `count` requests and `count` requests per minute on average
+        :param name: str
+        :param count: int
+        :return: RateLimitPolicy
+        """
+        return cls(name=name, rate=count / 60, capacity=count)
@@ -0,0 +1,227 @@
+import asyncio
+import datetime
+import math
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from logger import logger
+from app.src.base import settings, exceptions
+from app.src.base.cache import LRUCache
+from app.src.base.db import get_session
+from app.src.base.db.session import get_session_
+from app.src.auth.service import auth_service
+from app.src.rate_limit.models import RateLimitBucket
+from app.src.rate_limit.schemas import RateLimitPolicy
+
+KeyFunc = Callable[[Request, AsyncSession], Awaitable[Optional[str]]]
+
+
+class MemoryRateLimitBackend:
+    """
+    Per-process token buckets, bounded by LRU so spoofed keys can't eat memory
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self._buckets = LRUCache(max_size=max_keys)
+
+    async def hit(self, key: str, policy: RateLimitPolicy) -> float:
+        """
+        take one token from bucket
+        :param key: str
+        :param policy: schemas.RateLimitPolicy
+        :return: float - 0 if request is allowed, else seconds until next token
+        """
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (policy.capacity, now))
+        tokens = min(policy.capacity, tokens + (now - updated_at) * policy.rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / policy.rate
+        self._buckets.set(key, (tokens, now))
+        return retry_after
+
+    async def start(self) -> None:
+        return
+
+    async def stop(self) -> None:
+        return
+
+
+class PostgresRateLimitBackend:
+    """
+    Token buckets shared by all workers, every hit is one atomic upsert
+    """
+
+    hit_query = text(
+        """
+        INSERT INTO rate_limit_buckets (key, tokens, allowed, updated_at)
+        VALUES (:key, :capacity - 1, true, now())
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = CASE WHEN {refill} >= 1 THEN {refill} - 1 ELSE {refill} END,
+            allowed = {refill} >= 1,
+            updated_at = now()
+        RETURNING tokens, allowed
+        """.format(
+            refill="LEAST(:capacity, rate_limit_buckets.tokens + :rate * "
+            "EXTRACT(EPOCH FROM now() - rate_limit_buckets.updated_at))"
+        )
+    )
+
+    def __init__(self, purge_interval: int = 3600):
+        """
+        :param purge_interval: int - seconds between deleting of idle buckets
+        """
+        self.purge_interval = purge_interval
+        self._purge_task: Optional[asyncio.Task] = None
+
+    async def hit(self, key: str, policy: RateLimitPolicy) -> float:
+        """
+        take one token from bucket
+        :param key: str
+        :param policy: schemas.RateLimitPolicy
+        :return: float - 0 if request is allowed, else seconds until next token
+        """
+        session = await get_session_()
+        try:
+            tokens, allowed = (
+                await session.execute(
+                    self.hit_query,
+                    {"key": key, "capacity": policy.capacity, "rate": policy.rate},
+                )
+            ).one()
+            await session.commit()
+        finally:
+            await session.close()
+        if allowed:
+            return 0.0
+        return (1 - tokens) / policy.rate
+
+    async def purge_idle(self) -> None:
+        """
+        delete buckets that were idle long enough to be full again, they are the same as missing ones
+        :return: None
+        """
+        older_than = datetime.datetime.utcnow() - datetime.timedelta(
+            seconds=self.purge_interval
+        )
+        session = await get_session_()
+        try:
+            await session.execute(
+                delete(RateLimitBucket).where(RateLimitBucket.updated_at < older_than)
+            )
+            await session.commit()
+        finally:
+            await session.close()
+
+    async def _purge_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            try:
+                await self.purge_idle()
+            except Exception as e:
+                logger.error("rate limit purge failed: {error}", error=e)
+
+    async def start(self) -> None:
+        self._purge_task = asyncio.create_task(self._purge_loop())
+
+    async def stop(self) -> None:
+        if self._purge_task:
+            self._purge_task.cancel()
+
+
+class RateLimiter:
+    """
+    Applies token bucket policies to requests, buckets are kept by configured backend
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def check(self, policy: RateLimitPolicy, key: str) -> None:
+        """
+        take token for key or raise
+        :param policy: schemas.RateLimitPolicy
+        :param key: str
+        :return: None
+        :raise: RateLimited
+        """
+        retry_after = await self.backend.hit(f"{policy.name}:{key}", policy)
+        if retry_after > 0:
+            logger.warning("rate limited: {policy} {key}", policy=policy.name, key=key)
+            raise exceptions.RateLimited(
+                f"Too many requests ({policy.name})",
+                retry_after=math.ceil(retry_after),
+            )
+
+    def limit(self, policy: RateLimitPolicy, key_func: KeyFunc) -> Callable:
+        """
+        build FastAPI dependency applying policy to key returned by key_func,
+        requests without key (key_func returned None) are not limited
+        :param policy: schemas.RateLimitPolicy
+        :param key_func: async callable (request, session) -> key
+        :return: dependency
+        """
+
+        async def dependency(
+            request: Request, session: AsyncSession = Depends(get_session)
+        ) -> None:
+            key = await key_func(request, session)
+            if key is not None:
+                await self.check(policy, key)
+
+        return dependency
+
+
+async def client_ip(request: Request, session: AsyncSession) -> Optional[str]:
+    return request.client.host if request.client else None
+
+
+async def form_username(request: Request, session: AsyncSession) -> Optional[str]:
+    form = await request.form()  # already parsed and cached for route form params
+    return form.get("username")
+
+
+async def user_or_ip(request: Request, session: AsyncSession) -> Optional[str]:
+    identity = await auth_service.get_identity(request, session)
+    if identity is None:
+        return await client_ip(request, session)
+    return identity.username
+
+
+async def path_disk_id(request: Request, session: AsyncSession) -> Optional[str]:
+    return request.path_params.get("disk_id")
+
+
+def get_backend():
+    if settings.RATE_LIMIT_BACKEND == "postgres":
+        return PostgresRateLimitBackend()
+    return MemoryRateLimitBackend()
+
+
+rate_limiter = RateLimiter(get_backend())
+
+LOGIN_PER_IP = RateLimitPolicy.per_minute("login-ip", settings.RATE_LIMIT_LOGIN_PER_IP)
+LOGIN_PER_USERNAME = RateLimitPolicy.per_minute(
+    "login-username", settings.RATE_LIMIT_LOGIN_PER_USERNAME
+)
+DISK_MUTATION_PER_USER = RateLimitPolicy.per_minute(
+    "disk-user", settings.RATE_LIMIT_DISK_MUTATIONS_PER_USER
+)
+DISK_MUTATION_PER_DISK = RateLimitPolicy.per_minute(
+    "disk-id", settings.RATE_LIMIT_DISK_MUTATIONS_PER_DISK
+)
+
+login_rate_limits = [
+    Depends(rate_limiter.limit(LOGIN_PER_IP, client_ip)),
+    Depends(rate_limiter.limit(LOGIN_PER_USERNAME, form_username)),
+]
+disk_mutation_rate_limits = [
+    Depends(rate_limiter.limit(DISK_MUTATION_PER_USER, user_or_ip)),
+    Depends(rate_limiter.limit(DISK_MUTATION_PER_DISK, path_disk_id)),
+]
@@ -0,0 +1,78 @@
+"""
+Checkout latency of db pool under concurrent load for every pre-ping strategy.
+
+    python -m benchmarks.pool_checkout --concurrency 50 --iterations 40
+
+Every worker checks out connection, runs `select 1` and returns it. Checkout time
+(waiting for free connection plus pre-ping) and whole operation time are reported
+as percentiles, with and without pool warm-up
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+from app.src.base.db.session import build_engine, warm_up_pool
+
+
+def percentiles(values: list) -> str:
+    values = sorted(values)
+    quantiles = statistics.quantiles(values, n=100)
+    return (
+        f"p50={quantiles[49] * 1000:7.2f}ms p95={quantiles[94] * 1000:7.2f}ms "
+        f"p99={quantiles[98] * 1000:7.2f}ms max={values[-1] * 1000:7.2f}ms"
+    )
+
+
+async def run(strategy: str, warm: bool, options: argparse.Namespace) -> str:
+    engine = build_engine(
+        pool_size=options.pool_size,
+        max_overflow=options.max_overflow,
+        pre_ping=strategy,
+        pre_ping_idle=0 if strategy == "idle" else 30,  # worst case for idle
+    )
+    if warm:
+        await warm_up_pool(options.pool_size, engine)
+    checkouts, operations = [], []
+
+    async def worker():
+        for _ in range(options.iterations):
+            started = time.perf_counter()
+            connection = await engine.connect().start()
+            checked_out = time.perf_counter()
+            try:
+                await connection.execute(text("select 1"))
+            finally:
+                await connection.close()
+            checkouts.append(checked_out - started)
+            operations.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(options.concurrency)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    return (
+        f"{strategy:>6} warm={'yes' if warm else 'no ':3} "
+        f"ops/s={len(operations) / elapsed:8.0f}\n"
+        f"    checkout  {percentiles(checkouts)}\n"
+        f"    operation {percentiles(operations)}"
+    )
+
+
+async def main(options: argparse.Namespace) -> None:
+    for strategy in options.strategies.split(","):
+        for warm in (False, True):
+            sys.stdout.write(await run(strategy, warm, options) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=40)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--max-overflow", type=int, default=20)
+    parser.add_argument("--strategies", default="always,idle,never")
+    asyncio.run(main(parser.parse_args()))
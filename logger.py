@@ -1,25 +1,283 @@
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
 from datetime import datetime
 
+_STOP = object()
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+
+def get_level(level) -> int:
+    """
+    :param level: int or level name ("debug", "INFO", ...)
+    :return: int
+    """
+    if isinstance(level, str):
+        return {v: k for k, v in LEVEL_NAMES.items()}[level.upper()]
+    return level
+
 
 class Logger:
-    def _write_to_file_(self, msg):
+    """
+    Queue based logger: log() only puts record into queue, background thread
+    formats records and writes them in batches into logs/<date>.log through one open file handle.
+    Record is message template plus fields, `template.format(**fields)` is called by writer
+    and only for records passing min level, so disabled debug logs cost one comparison
+    """
+
+    def __init__(
+        self,
+        directory: str = "logs",
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+        max_file_size: int = 50 * 1024 * 1024,
+        max_queue_size: int = 10000,
+        queue_policy: str = "drop",
+        echo: bool = True,
+        level: int = INFO,
+        format: str = "text",
+    ):
+        """
+        :param directory: str - folder for .log files
+        :param batch_size: int - flush file when so many messages are pending
+        :param flush_interval: float - flush file at least every N seconds
+        :param max_file_size: int - bytes, bigger file is rotated to <date>.<n>.log
+        :param max_queue_size: int - max count of not written messages
+        :param queue_policy: str - "drop" new messages or "block" caller when queue is full
+        :param echo: bool - write messages into stdout too
+        :param level: int or level name - min level of written records
+        :param format: str - "text" lines or "json" lines with fields as keys
+        """
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_file_size = max_file_size
+        self.max_queue_size = max_queue_size
+        self.queue_policy = queue_policy
+        self.echo = echo
+        self.level = get_level(level)
+        self.format = format
+
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._file_date = None
+
+    def configure(self, **options) -> None:
+        """
+        change logger options, running writer is restarted to apply them
+        :param options: same as __init__ params
+        :return: None
+        """
+        running = self._thread is not None
+        if running:
+            self.stop()
+        for name, value in options.items():
+            if not hasattr(self, name):
+                raise AttributeError(f"unknown logger option {name}")
+            if name == "level":
+                value = get_level(value)
+            setattr(self, name, value)
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        if running:
+            self.start()
+
+    def start(self) -> None:
+        """
+        start background writer thread if it is not running
+        :return: None
+        """
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        """
+        write all queued messages, close file and stop writer thread
+        :param timeout: float - max seconds to wait for writer
+        :return: None
+        """
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def flush(self, timeout: float = 5) -> None:
         """
-        sub method for open and write into .log file
-        :param msg: str
+        block until all messages queued before this call are written
+        :param timeout: float
         :return: None
         """
-        with open(f"logs/{datetime.now().date()}.log", "a") as f:
-            f.write(msg + "\n")
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
 
-    @staticmethod
-    def log(msg):
+    def is_enabled_for(self, level: int) -> bool:
+        return level >= self.level
+
+    def debug(self, msg: str, **fields) -> None:
+        self._enqueue(DEBUG, msg, fields)
+
+    def info(self, msg: str, **fields) -> None:
+        self._enqueue(INFO, msg, fields)
+
+    def warning(self, msg: str, **fields) -> None:
+        self._enqueue(WARNING, msg, fields)
+
+    def error(self, msg: str, **fields) -> None:
+        self._enqueue(ERROR, msg, fields)
+
+    def log(self, msg: str, **fields) -> None:
         """
-        print into cmd and write to file log message
-        :param msg: str
+        put INFO record into queue, it will be printed into cmd and written to file by writer thread
+        :param msg: str - message template, formatted with fields
+        :param fields: values for message template
         :return: None
         """
-        print(msg)
-        logger._write_to_file_(msg)
+        self._enqueue(INFO, msg, fields)
+
+    def _enqueue(self, level: int, msg: str, fields: dict) -> None:
+        if level < self.level:
+            return
+        if self._thread is None:
+            self.start()
+        record = (time.time(), level, msg, fields)
+        try:
+            if self.queue_policy == "block":
+                self._queue.put(record)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _format(self, record: tuple) -> str:
+        """
+        render record into one line
+        :param record: tuple (created, level, template, fields)
+        :return: str
+        """
+        created, level, msg, fields = record
+        try:
+            message = msg.format(**fields) if fields else str(msg)
+        except Exception as err:
+            # fields are not touched again, their repr may raise as well
+            message = f"{msg} (format error: {type(err).__name__})"
+        timestamp = datetime.fromtimestamp(created)
+        if self.format == "json":
+            line = {"time": timestamp.isoformat(), "level": LEVEL_NAMES[level]}
+            try:
+                return json.dumps({**line, **fields, "message": message}, default=repr)
+            except Exception as err:
+                line["message"] = f"{message} (fields error: {type(err).__name__})"
+                return json.dumps(line)
+        return f"{timestamp} - {LEVEL_NAMES[level]} - {message}"
+
+    def _run(self) -> None:
+        pending = []
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._write(pending)
+                self._close()
+                return
+            if isinstance(item, threading.Event):
+                self._write(pending)
+                pending = []
+                item.set()
+                continue
+            if item is not None:
+                try:
+                    pending.append(self._format(item))
+                except Exception:  # never let a bad record kill the writer
+                    self.dropped += 1
+
+            now = time.monotonic()
+            if pending and (
+                len(pending) >= self.batch_size
+                or item is None
+                or now - last_flush >= self.flush_interval
+            ):
+                self._write(pending)
+                pending = []
+                last_flush = now
+
+    def _write(self, messages: list) -> None:
+        """
+        sub method for write batch of messages into .log file (and stdout)
+        :param messages: list[str]
+        :return: None
+        """
+        if not messages:
+            return
+        chunk = "\n".join(messages) + "\n"
+        if self.echo:
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+        try:
+            log_file = self._get_file()
+            log_file.write(chunk)
+            log_file.flush()
+        except OSError as err:
+            sys.stderr.write(f"logger: can't write log file: {err}\n")
+            self._close()
+
+    def _get_file(self):
+        """
+        return opened file of today log, rotate it by day and by size
+        :return: file object
+        """
+        today = datetime.now().date()
+        if self._file is not None and (
+            self._file_date != today or self._file.tell() >= self.max_file_size
+        ):
+            self._close()
+            self._rotate_by_size(today)
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._rotate_by_size(today)
+            self._file = open(os.path.join(self.directory, f"{today}.log"), "a")
+            self._file_date = today
+        return self._file
+
+    def _rotate_by_size(self, day) -> None:
+        path = os.path.join(self.directory, f"{day}.log")
+        if not os.path.exists(path) or os.path.getsize(path) < self.max_file_size:
+            return
+        index = 1
+        while os.path.exists(os.path.join(self.directory, f"{day}.{index}.log")):
+            index += 1
+        os.rename(path, os.path.join(self.directory, f"{day}.{index}.log"))
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._file_date = None
 
 
 logger = Logger()
+atexit.register(logger.stop)
@@ -1,90 +1,243 @@
-import datetime
+import asyncio
 
 from fastapi import FastAPI, Depends
 from fastapi.exceptions import RequestValidationError
 from fastapi.requests import Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from starlette.responses import PlainTextResponse, RedirectResponse
-from starlette.staticfiles import StaticFiles
+from starlette.responses import PlainTextResponse, RedirectResponse, Response
 from urllib.parse import quote
-import os
 
-from app.src import auth_router
-from app.src.auth.service import auth_service
-from app.src.base.exceptions import Unauthorized
+from app.src import auth_router, diagnostics_router
+from app.src.auth.service import auth_service, password_pool
+from app.src.base.exceptions import (
+    DatabaseUnavailable,
+    Forbidden,
+    Unauthorized,
+    WorkerPoolBusy,
+    RateLimited,
+)
 from app.src.disk_manager import disk_manager_router
-from app.src.base import get_session
+from app.src.base import get_session, settings
+from app.src.base.compression import CompressionMiddleware
+from app.src.base import metrics
+from app.src.base.db.session import async_session, replica_router, warm_up_pool
+from app.src.base.loop_monitor import loop_monitor
+from app.src.base.profiling import ProfilingMiddleware, profile_store
+from app.src.base.tracing import (
+    JsonFileSpanExporter,
+    OTLPHttpSpanExporter,
+    TracingMiddleware,
+    tracer,
+)
+from app.src.base.static import (
+    PRECOMPRESSED,
+    PrecompressedStaticFiles,
+    static_assets,
+)
+from app.src.base.templating import templates, precompile
 from logger import logger
 from app.src import disk_manager_init_db
+from app.src import auth_tasks
+from app.src import disk_manager_tasks
+from app.src.rate_limit.service import rate_limiter
 
 app = FastAPI()
-templates = Jinja2Templates(directory="templates")
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    content_types=settings.COMPRESSION_CONTENT_TYPES.split(","),
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    cache_size=settings.COMPRESSION_CACHE_SIZE,
+)
+
+
+async def profiling_allowed(request: Request) -> bool:
+    """
+    only authed users may ask for request profile
+    :param request: fastapi.Request
+    :return: bool
+    """
+    access_token = request.cookies.get("access_token")
+    if not access_token:
+        return False
+    async with async_session() as session:
+        return await auth_service.resolve_token(session, access_token) is not None
+
+
+app.add_middleware(
+    ProfilingMiddleware,
+    store=profile_store,
+    authorize=profiling_allowed,
+    header=settings.PROFILING_HEADER,
+    sample_rate=settings.PROFILING_SAMPLE_RATE,
+    slow_threshold=settings.PROFILING_SLOW_THRESHOLD_SECONDS,
+)
+app.add_middleware(TracingMiddleware)
+# outermost, so observed duration includes compression and profiling
+app.add_middleware(metrics.MetricsMiddleware)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount(
+    "/static",
+    PrecompressedStaticFiles(assets=static_assets, check_dir=False),
+    name="static",
+)
+templates.env.globals["static_url"] = static_assets.url
 
 app.include_router(auth_router.router)
 app.include_router(disk_manager_router.router)
+app.include_router(diagnostics_router.router)
 
 
 @app.exception_handler(Unauthorized)
 async def unauthorized_exception_handler(request, exc):
-    logger.log("Unauthorized request")
+    logger.info("Unauthorized request")
     return RedirectResponse(url="/auth/login" + "?next=" + quote(request.url.path))
 
 
+@app.exception_handler(Forbidden)
+async def forbidden_exception_handler(request, exc):
+    logger.warning("Forbidden request: {error}", error=exc)
+    return PlainTextResponse("Forbidden", status_code=403)
+
+
+@app.exception_handler(WorkerPoolBusy)
+async def worker_pool_busy_exception_handler(request, exc):
+    logger.warning("Worker pool busy: {error}", error=exc)
+    return PlainTextResponse(
+        "Server is busy, try again later", status_code=503, headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(DatabaseUnavailable)
+async def database_unavailable_exception_handler(request, exc):
+    return PlainTextResponse(
+        "Database is unavailable, try again later",
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(RateLimited)
+async def rate_limited_exception_handler(request, exc):
+    return PlainTextResponse(
+        str(exc), status_code=429, headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
-    logger.log(f"ErrorL {exc}")
+    logger.warning("Error: {error}", error=exc)
     return PlainTextResponse(str(exc), status_code=400)
 
 
 # add action on app startup
 @app.on_event("startup")
 async def init_disks_in_db():
-    # create if no /logs and create today log file
-    if not os.path.exists("logs"):
-        os.mkdir("logs")
-    if not os.path.exists(f"logs/{datetime.datetime.now().date()}.log"):
-        with open(f"logs/{datetime.datetime.now().date()}.log", "w") as f:
-            f.write(
-                f"{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Log file created for {datetime.datetime.now().date()}\n"
-            )
+    logger.configure(
+        directory=settings.LOG_DIR,
+        batch_size=settings.LOG_BATCH_SIZE,
+        flush_interval=settings.LOG_FLUSH_INTERVAL,
+        max_file_size=settings.LOG_MAX_FILE_SIZE_MB * 1024 * 1024,
+        max_queue_size=settings.LOG_QUEUE_SIZE,
+        queue_policy=settings.LOG_QUEUE_POLICY,
+        echo=settings.LOG_ECHO,
+        level=settings.LOG_LEVEL,
+        format=settings.LOG_FORMAT,
+    )
+    logger.start()
+
+    if settings.TRACING_EXPORTER == "file":
+        exporter = JsonFileSpanExporter(settings.TRACING_FILE)
+    elif settings.TRACING_EXPORTER == "otlp":
+        exporter = OTLPHttpSpanExporter(
+            settings.TRACING_OTLP_ENDPOINT, service_name=settings.TRACING_SERVICE_NAME
+        )
+    else:
+        exporter = None
+    if exporter is not None:
+        tracer.configure(
+            exporter,
+            batch_size=settings.TRACING_BATCH_SIZE,
+            flush_interval=settings.TRACING_FLUSH_INTERVAL,
+        )
+
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    built = static_assets.build()
+    logger.info(
+        "Built {count} static files, precompressed: {encodings}",
+        count=len(built),
+        encodings=", ".join(PRECOMPRESSED),
+    )
+    compiled = precompile(templates)
+    logger.info("Precompiled {count} templates", count=compiled)
+
+    warmed = await warm_up_pool(settings.DB_POOL_WARMUP)
+    logger.info("Opened {count} db connections", count=warmed)
+    await replica_router.start()
 
     await disk_manager_init_db.init_disks_in_db()
 
-    logger.log("On app startup action completed")
+    app.state.token_purge_task = asyncio.create_task(auth_tasks.token_purge_loop())
+    app.state.change_log_trim_task = asyncio.create_task(
+        disk_manager_tasks.change_log_trim_loop()
+    )
+    await rate_limiter.backend.start()
+
+    logger.info("On app startup action completed")
 
     return
 
 
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    app.state.token_purge_task.cancel()
+    app.state.change_log_trim_task.cancel()
+    loop_monitor.stop()
+    tracer.shutdown()
+    password_pool.shutdown()
+    await rate_limiter.backend.stop()
+    await replica_router.stop()
+    logger.info("On app shutdown action completed")
+    logger.stop()
+
+
 async def get_context(request: Request, session: AsyncSession = Depends(get_session)):
-    token_cooke = request.cookies.get("access_token")
-    access_token = await auth_service.get_access_token_from_cookie(token_cooke)
-    print("access", access_token)
-    if access_token:
-        username = await auth_service.get_username_from_token(
-            session=session, access_token=access_token
-        )
-    else:
-        username = None
+    identity = await auth_service.get_identity(request, session)
+    access_token = identity.access_token if identity else None
+    username = identity.username if identity else None
 
-    logger.log(f"Context (main.py): {request} {access_token} {username}")
+    logger.debug(
+        "Context (main.py): {request} {access_token} {username}",
+        request=request,
+        access_token=access_token,
+        username=username,
+    )
 
     return {"request": request, "access_token": access_token, "username": username}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    metrics of app in Prometheus text format
+    :return: text/plain
+    """
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request, context: dict = Depends(get_context)):
-    logger.log(f"Home (GET): {request} {context}")
+    logger.debug("Home (GET): {request} {context}", request=request, context=context)
     return templates.TemplateResponse("home.html", context)
 
 
 @app.post("/", response_class=HTMLResponse)
 async def home_post(request: Request, context: dict = Depends(get_context)):
-    logger.log(f"Home (POST): {request} {context}")
+    logger.debug("Home (POST): {request} {context}", request=request, context=context)
     return templates.TemplateResponse("home.html", context)
 
 